@@ -143,6 +143,10 @@ pip install -U Flask
 pip install -U netifaces
 pip install -U requests
 
+# Install production server with threaded workers (futures is needed by threaded workers on Python 2)
+pip install -U "gunicorn<20"
+pip install -U futures
+
 # -----------------------------------------------
 # -------------- Test NLP tools  ----------------
 # -----------------------------------------------
@@ -1,14 +1,28 @@
 # -*- coding: utf-8 -*-
-import netifaces, logging, requests
+import os, sys, time, json, getopt, netifaces, logging, requests
 
 # Flask was used as REST API framework http://flask.pocoo.org/docs/0.11/
 # Tutorial https://blog.miguelgrinberg.com/post/designing-a-restful-api-with-python-and-flask
-from flask import Flask, jsonify, abort, make_response, request, url_for
+from flask import Flask, jsonify, abort, make_response, request, url_for, g
+
+import Application_functions
+from LRUCache import LRUCache
+from JobQueue import JobQueue, JobQueueFull
+import Metrics
 
 from Application_functions import OverallSentiment
-from Application_functions import NERsentiment
+from Application_functions import OverallSentimentBatch
+from Application_functions import OverallSentimentFast
+from Application_functions import NERsentimentBatch
 from Application_functions import MorphAnalysis
+from Application_functions import MorphAnalysisBatch
 from Application_functions import NER
+from Application_functions import LoadNER
+from Application_functions import CacheStats
+from Application_functions import WatchModel
+from Application_functions import PinModel
+from Application_functions import UnpinModel
+from Application_functions import RequestModel
 
 # Initialization of logger
 logger = logging.getLogger('SentimentAnalysisHUN')
@@ -24,18 +38,159 @@ logger.setLevel(logging.WARNING)
 # Github Read
 githubUrl = 'https://github.com/dhuszti/SentimentAnalysisHUN/blob/master/README.md'
 
+# Response cache for /sentiment and /sentiment_verbose, identical inputs skip the whole analysis
+responseCacheEnabled = True
+responseCacheSize = 10000
+responseCacheTimeToLive = 3600
+responseCache = LRUCache(responseCacheSize, timeToLive=responseCacheTimeToLive)
+
+# Load Polyglot NER models at start of application instead of at first /sentiment_verbose request
+nerPreload = True
+
+# Background jobs for long inputs: a single worker thread keeps one resident tool of each pool (toolPoolSize) free for
+# real-time requests, and queue is bounded. Results are files, so any server worker process answers status requests.
+jobWorkers = 1
+jobQueueSize = 100
+jobResultDir = '/var/tmp/SentimentAnalysisHUN_jobs'
+jobTimeToLive = 3600
+jobQueue = JobQueue(jobWorkers, jobQueueSize, jobResultDir, jobTimeToLive)
+
+# Stage timings of a request are attached to its JSON response, if it is requested with '?debug=1'
+debugTimingsEnabled = True
+
+# Workers of production server sum their /metrics and /stats through files in this directory (PROMETHEUS_MULTIPROC_DIR
+# environment variable overrides it, e.g. for several servers on one machine)
+metricsDir = '/var/tmp/SentimentAnalysisHUN_metrics'
+
+# Server defaults, overridden by command line options. With 0 workers Flask's development server is used.
+serverPort = 5000
+serverWorkers = 0
+serverThreads = 1
+
+
+def ResponseCacheKey(endpoint, inputString):
+	# whitespace normalized input, results are valid only for the model which created them (pinned by request)
+	return (endpoint, RequestModel()[1], ' '.join(inputString.split()))
+
+def CachedResponse(endpoint, inputString):
+	if not responseCacheEnabled:
+		return None
+	sentimentList = responseCache.Get(ResponseCacheKey(endpoint, inputString))
+	if sentimentList is None:
+		return None
+	# overall score contains input as it was sent this time
+	sentimentList = [dict(score) for score in sentimentList]
+	sentimentList[0]['input sentence'] = inputString
+	return sentimentList
+
+def StoreResponse(endpoint, inputString, sentimentList):
+	if responseCacheEnabled:
+		responseCache.Put(ResponseCacheKey(endpoint, inputString), sentimentList)
+
+def VerboseSentiment(inputString, sentimentList):
+	# get morphological analyzed output
+	morphAnalyzed = MorphAnalysis(inputString)
+
+	# get NER dictionaries extracted from input text		
+	(locationList, personList, organizationList) = NER(inputString)
+
+	# call sentiment for overall scores
+	OverallSentiment(inputString, morphAnalyzed, sentimentList)
+
+	# call sentiment for named-entity related scores
+	NERsentimentBatch(morphAnalyzed, [(locationList, 'location'), (personList, 'person'), (organizationList, 'organization')], sentimentList)
+
+	StoreResponse('sentiment_verbose', inputString, sentimentList)
+
+def BatchSentiment(inputStrings, sentimentList):
+	# get morphological analyzed output of every document in one pass, failed documents are None
+	errors = {}
+	morphAnalyzedList = MorphAnalysisBatch(inputStrings, errors)
+
+	# call sentiment for overall scores of analyzed documents
+	analyzed = [index for index, morphAnalyzed in enumerate(morphAnalyzedList) if morphAnalyzed is not None]
+	scores = []
+	OverallSentimentBatch([inputStrings[index] for index in analyzed], [morphAnalyzedList[index] for index in analyzed], scores)
+
+	# failed documents get an error entry, so results stay in original order
+	scores = iter(scores)
+	for index, inputString in enumerate(inputStrings):
+		if index in errors:
+			sentimentList.append({'input sentence': inputString, 'error': errors[index]})
+		else:
+			sentimentList.append(next(scores))
+
+def VerboseSentimentJob(inputString):
+	# a job pins the model for itself, as a request does
+	PinModel()
+	try:
+		sentimentList = CachedResponse('sentiment_verbose', inputString)
+		if sentimentList is None:
+			sentimentList = []
+			VerboseSentiment(inputString, sentimentList)
+		return sentimentList
+	finally:
+		UnpinModel()
+
+def BatchSentimentJob(inputStrings):
+	PinModel()
+	try:
+		sentimentList = []
+		BatchSentiment(inputStrings, sentimentList)
+		return sentimentList
+	finally:
+		UnpinModel()
+
+def ValidSentences(sentences):
+	return isinstance(sentences, list) and all(isinstance(s, basestring) for s in sentences)
+
 
 """ This is a REST API for easier user interface access to the sentiment analysis tool
 
 Defined functions:
 - GET for /: overview page contains usage example
-- POST for /sentiment: request for an overall sentiment score
+- GET for /stats: hit/miss counters of internal caches for monitoring, summed over server worker processes
+- GET for /metrics: latency histograms of processing stages and requests in Prometheus text format, summed over server worker processes
+- POST for /sentiment: request for an overall sentiment score, '?mode=fast' for a fast score without HunPos and ocamorph
 - POST for /sentiment_verbose: request for more detailed (entity focused) sentiment scores
+- POST for /sentiment_batch: request for overall sentiment scores of several sentences at once
+- POST for /jobs: background job for a long input ('sentence', verbose scores) or a list ('sentences', overall scores), gives back a job id
+- GET for /jobs/<job id>: status of a background job, with its results when it is done
 
 *** All rights are reserved by open-source Flask REST API framework. *** """
 
 app = Flask(__name__)
 
+@app.before_request
+def before_request():
+	# model file is checked for changes in background of every worker process
+	WatchModel()
+	# whole request is scored (and its response cached) with the model which is current at its start
+	PinModel()
+
+	g.requestStart = time.time()
+	if debugTimingsEnabled and request.args.get('debug') == '1':
+		Metrics.StartTimings()
+
+@app.after_request
+def after_request(response):
+	Metrics.Observe(Metrics.requestMetric, 'endpoint', str(request.url_rule) if request.url_rule else 'unknown', time.time() - getattr(g, 'requestStart', time.time()))
+
+	# stage timings of this request are added to JSON output in debug mode
+	timings = Metrics.StopTimings()
+	if timings is not None and response.mimetype == 'application/json':
+		output = json.loads(response.get_data())
+		if isinstance(output, dict):
+			output['timings'] = timings
+			response.set_data(json.dumps(output))
+	return response
+
+@app.teardown_request
+def teardown_request(exception):
+	# timings and model of a failed request are not left to next request of same thread
+	Metrics.StopTimings()
+	UnpinModel()
+
 @app.errorhandler(400)
 def not_found(error):
     return make_response(jsonify( { 'error': 'Bad request' } ), 400)
@@ -44,25 +199,58 @@ def not_found(error):
 def not_found(error):
     return make_response(jsonify( { 'error': 'Not found' } ), 404)
 
+@app.errorhandler(503)
+def service_unavailable(error):
+    return make_response(jsonify( { 'error': 'Job queue is full, please try again later' } ), 503)
+
 @app.route('/', methods = ['GET'])
 def description():
     return requests.get(githubUrl).text
 
+def AllCacheStats():
+    cacheStats = CacheStats()
+    cacheStats['response'] = responseCache.Stats()
+    return cacheStats
+
+# counters of every process are summed with latency histograms
+Metrics.statsFunction = AllCacheStats
+
+@app.route('/stats', methods = ['GET'])
+def stats():
+    return jsonify(Metrics.Stats())
+
+@app.route('/metrics', methods = ['GET'])
+def metrics():
+    return make_response(Metrics.PrometheusText(), 200, {'Content-Type': 'text/plain; version=0.0.4'})
+
 @app.route('/sentiment', methods=['POST'])
 def sentiment():
 	if not request.json or not 'sentence' in request.json:
 		abort(400)
-	try:
-		# get morphological analyzed output
-		morphAnalyzed = MorphAnalysis(request.json['sentence'])
+	if not isinstance(request.json['sentence'], basestring):
+		abort(400)
 
-		# get NER dictionaries extracted from input text		
-		(locationList, personList, organizationList) = NER(request.json['sentence'])
+	# with '?mode=fast' HunPos and ocamorph are called only if fast score is neutral
+	endpoint = 'sentiment_fast' if request.args.get('mode') == 'fast' else 'sentiment'
 
-		sentimentList = []
+	# identical input was already answered
+	sentimentList = CachedResponse(endpoint, request.json['sentence'])
+	if sentimentList is not None:
+		return jsonify(results = sentimentList), 201
+
+	sentimentList = []
 
-		# call sentiment for overall scores
-		OverallSentiment(request.json['sentence'], morphAnalyzed, sentimentList)
+	try:
+		if endpoint == 'sentiment_fast':
+			OverallSentimentFast(request.json['sentence'], sentimentList)
+		else:
+			# get morphological analyzed output, entities are not needed for overall score
+			morphAnalyzed = MorphAnalysis(request.json['sentence'])
+
+			# call sentiment for overall scores
+			OverallSentiment(request.json['sentence'], morphAnalyzed, sentimentList)
+
+		StoreResponse(endpoint, request.json['sentence'], sentimentList)
 	except Exception:
 		logger.error("Exception occurred at http post request for /sentiment")
 		logger.exception("Sentiment_exception")
@@ -74,35 +262,92 @@ def sentiment():
 def sentiment_verbose():
 	if not request.json or not 'sentence' in request.json:
 		abort(400)
+	if not isinstance(request.json['sentence'], basestring):
+		abort(400)
+
+	# identical input was already answered
+	sentimentList = CachedResponse('sentiment_verbose', request.json['sentence'])
+	if sentimentList is not None:
+		return jsonify(results = sentimentList), 201
+
+	sentimentList = []
 
 	try:
-		# get morphological analyzed output
-		morphAnalyzed = MorphAnalysis(request.json['sentence'])
-	
-		# get NER dictionaries extracted from input text		
-		(locationList, personList, organizationList) = NER(request.json['sentence'])
+		VerboseSentiment(request.json['sentence'], sentimentList)
+	except Exception:
+		logger.error("Exception occurred at http post request for /sentiment_verbose")
+		logger.exception("Sentiment_verbose_exception")
 
-		sentimentList = []
+	# return output as jsonify
+	return jsonify(results = sentimentList), 201
 
-		# call sentiment for overall scores
-		OverallSentiment(request.json['sentence'], morphAnalyzed, sentimentList)
+@app.route('/sentiment_batch', methods=['POST'])
+def sentiment_batch():
+	if not request.json or not 'sentences' in request.json:
+		abort(400)
+	if not ValidSentences(request.json['sentences']):
+		abort(400)
 
-		# call sentiment for named-entity related scores
-		NERsentiment(morphAnalyzed, locationList, 'location', sentimentList)
-		NERsentiment(morphAnalyzed, personList, 'person', sentimentList)
-		NERsentiment(morphAnalyzed, organizationList, 'organization', sentimentList)
+	sentimentList = []
 
+	try:
+		BatchSentiment(request.json['sentences'], sentimentList)
 	except Exception:
-		logger.error("Exception occurred at http post request for /sentiment_verbose")
-		logger.exception("Sentiment_verbose_exception")
+		logger.error("Exception occurred at http post request for /sentiment_batch")
+		logger.exception("Sentiment_batch_exception")
 
 	# return output as jsonify
 	return jsonify(results = sentimentList), 201
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+	# a single document gets verbose scores, a list of documents overall scores
+	if request.json and 'sentence' in request.json and isinstance(request.json['sentence'], basestring):
+		(function, args) = (VerboseSentimentJob, (request.json['sentence'],))
+	elif request.json and 'sentences' in request.json and ValidSentences(request.json['sentences']):
+		(function, args) = (BatchSentimentJob, (request.json['sentences'],))
+	else:
+		abort(400)
+
+	try:
+		jobId = jobQueue.Submit(function, args)
+	except JobQueueFull:
+		abort(503)
+
+	response = make_response(jsonify({'job id': jobId, 'status': 'queued', 'url': url_for('job_status', jobId=jobId)}), 202)
+	response.headers['Location'] = url_for('job_status', jobId=jobId)
+	return response
+
+@app.route('/jobs/<jobId>', methods=['GET'])
+def job_status(jobId):
+	status = jobQueue.Status(jobId)
+	if status is None:
+		abort(404)
+	return jsonify(status)
+
+
 
+""" Main function for Sentiment Analysis API access
 
-""" Main function for Sentiment Analysis API access """
+Usage:
+	python Application.py [-w <workers>] [-t <threads per worker>] [-p <port>]
+
+With workers the production server (ProductionServer.py, gunicorn) is started with pre-forked workers,
+without workers the Flask development server.
+"""
 def main():
+	usage = "Please use [-w <workers>] [-t <threads per worker>] [-p <port>]"
+	try:
+		(opts, args) = getopt.getopt(sys.argv[1:], 'w:t:p:')
+	except getopt.GetoptError as error:
+		print str(error) + ' ' + usage
+		sys.exit(1)
+
+	options = dict(opts)
+	workers = int(options.get('-w', serverWorkers))
+	threads = int(options.get('-t', serverThreads))
+	port = int(options.get('-p', serverPort))
+
 	# Network interfaces determination for IP address determination. 
 	# source: http://stackoverflow.com/questions/11735821/python-get-localhost-ip
 	try:	
@@ -124,12 +369,14 @@ def main():
 	print ""
 	print "\033[0;32m Please use sentence tag for adding user input. Example {\"sentence\": \"Teszt mondat\"} \033[0m"
 	print ""
-	print "\033[0;32m Tool has two different HTTP POST request:\033[0m"
-	print "\033[0;32m	/sentiment: 	for overall score  \033[0m"
+	print "\033[0;32m Tool has four different HTTP POST request:\033[0m"
+	print "\033[0;32m	/sentiment: 	for overall score, /sentiment?mode=fast for a fast estimate  \033[0m"
 	print "\033[0;32m	/sentiment_verbose: for more detailed scores \033[0m"
+	print "\033[0;32m	/sentiment_batch: 	for overall scores of a list, example {\"sentences\": [\"Első mondat\", \"Második mondat\"]} \033[0m"
+	print "\033[0;32m	/jobs: 		background job for long inputs, gives back a job id, results are at GET /jobs/<job id> \033[0m"
 	print ""
 	print "\033[0;32m Usage example from Linux/Mac console with curl: \033[0m"
-	print "\033[0;32m curl -i -H 'Content-Type: application/json' -X POST -d '{\"sentence\": \"Ide írja a teszt mondatot.\"}' http://"+ip_addr+":5000/sentiment \033[0m"
+	print "\033[0;32m curl -i -H 'Content-Type: application/json' -X POST -d '{\"sentence\": \"Ide írja a teszt mondatot.\"}' http://"+ip_addr+":"+str(port)+"/sentiment \033[0m"
 	print ""
 	print "\033[0;32m For Windows use an REST client like https://github.com/wiztools/rest-client \033[0m"
 	print "\033[0;32m ****************************************************************************** \033[0m"
@@ -137,8 +384,16 @@ def main():
 
 	# run application
 	try:
+		if nerPreload:
+			LoadNER()
 		app.config['JSON_AS_ASCII'] = False
-		app.run(host=ip_addr, port=5000)
+		if workers > 0:
+			from ProductionServer import RunServer
+			# metrics of every worker are collected, whichever of them answers a scrape
+			Metrics.EnableMultiprocess(os.environ.get('PROMETHEUS_MULTIPROC_DIR', metricsDir))
+			RunServer(app, ip_addr, port, workers, threads)
+		else:
+			app.run(host=ip_addr, port=port)
 	except Exception:
 		logger.error("Exception occurred while started running application")
 		logger.exception("App_run_exception")
@@ -1,101 +1,358 @@
 # -*- coding: utf-8 -*-
-import subprocess
+import os, time, atexit, hashlib, threading, logging
 from os.path import expanduser
 from sklearn.externals import joblib
-from polyglot.text import Text
-from itertools import chain
+from itertools import chain, izip
 
-from Morphological_Disambiguation import MorphologicalDisambiguation, StemmedForm
+from Morphological_Disambiguation import MorphologicalDisambiguationLines, StemmedForm
 from Classifier import CountVectorizerTransform_input
+from CompactModel import LoadCompactModel, CompactModelPath
+import NLPToolPool, Tokenizer
+from NLPToolPool import ToolPool, HunPosTagger, OcamorphAnalyzer, CachedAnalyzerPool, RunInParallel
+from LRUCache import LRUCache
+from Postprocess import SentenceFilter
+from FeatureExtraction import sentence_index
+from Metrics import Timed, TimedFunction
 
 '''
 Functions:
 - MorphAnalysis: morhological analysis and disambiguation task with a multidimensional list as output
+- MorphAnalysisBatch: same as MorphAnalysis for several documents, with a single pass through the NLP tools,
+  with an 'errors' dictionary documents which can not be analyzed are given back as None and their errors are collected
+- MorphAnalysisFast: stemming without HunPos and ocamorph, with analyses already in morphological analysis cache
+- LoadNER: imports Polyglot and loads its Hungarian models once per process, NER calls it at first usage
 - NER: creates three dictionaries as output, containing locations, person and organization names with extraction from input text
 - SentimentScore: calls sentiment scoring machine learning model's prediction function for morphological analyzed data 
+- SentimentScoreBatch: same as SentimentScore for several documents, with a single prediction call
 - OverallSentiment: function creates an overall sentiment for whole input text
+- OverallSentimentBatch: creates overall sentiments for several input texts in their original order
+- OverallSentimentFast: overall sentiment with MorphAnalysisFast, full analysis is used only if fast score is neutral
+- EntityWindow: determines entity's first position and gives back the restricted interval around it
 - EntitySentimentScore: function determines entities' index and start/end position and calculates sentiment for this restricted interval
-- NERsentiment: creates json format for EntitySentimentScore function
+- NERsentiment: creates json format of entity scores
+- NERsentimentBatch: same as NERsentiment for several entity lists, all entities are scored with a single prediction call
+- CacheStats: hit/miss counters of caches for monitoring
+- LoadModel: loads machine learning model with its version (hash of model file), from its compact artifact if it was exported from same version
+- ReloadModel: loads model file again if it is changed and swaps it in without stopping requests
+- WatchModel: starts a thread in current process which calls ReloadModel periodically
+- PinModel / UnpinModel: model and its version used by current thread until the end of its request, even if model is reloaded meanwhile
+- RequestModel: (model, version) pinned by current thread, or the current one if nothing is pinned
 '''
 
 
 # get user's home folder
 homeFolder = expanduser('~')
-# load machine learning model file
-ML_model = joblib.load(open( homeFolder + '/SentimentAnalysisHUN-master/src/SentAnalysisModel.pkl'))
+# machine learning model file
+MLmodelFilePath = homeFolder + '/SentimentAnalysisHUN-master/src/SentAnalysisModel.pkl'
+# compact artifact of model (SentAnalysisModel.compact, see CompactModel.py) is loaded instead of unpickling model, if it has same version
+compactModelEnabled = True
+# 'r' memory-maps NumPy arrays of model, so server workers share them through page cache (only for models saved without compression)
+modelMmapMode = None
+# seconds between checks of model file, changed model is loaded in background and swapped in (None to switch off)
+modelReloadInterval = 30
 # file pathes for morhological analysis
-xmlparserFilePath = homeFolder + '/SentimentAnalysisHUN-master/src/xmlparser.py'
 hunpostagFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/HunPos/hunpos-1.0-linux/hunpos-tag'
 szegedmodelFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/HunPos/hu_szeged_kr.model'
 ocamorphFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/HunMorph/morphdb.hu/morphdb_hu.bin'
-posFilePath = '/tmp/SentimentAnalysis_pos.txt'
-morphFilePath = '/tmp/SentimentAnalysis_morph.txt'
+stopwordsFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/StopwordLexicon/stopwords.txt'
+# Polyglot NER is loaded only if entity scores are requested
+polyglotText = None
+nerLock = threading.Lock()
+# 'python' tokenizes in process (Tokenizer.py), 'huntoken' starts huntoken for every request
+tokenizer = 'python'
+# number of resident hunpos-tag and ocamorph processes per worker
+toolPoolSize = 2
+
+logger = logging.getLogger('SentimentAnalysisHUN')
+
+# maximum number of words in morphological analysis cache, and its file to keep it between restarts (None to switch off)
+morphCacheSize = 200000
+morphCacheFilePath = '/var/tmp/SentimentAnalysisHUN_morphcache.pkl'
+
+# cache of ocamorph analyses, saved at exit by processes which added new analyses (e.g. not by a server master process)
+morphCache = LRUCache(morphCacheSize, morphCacheFilePath)
+if morphCacheFilePath is not None:
+	atexit.register(lambda: morphCache.modified and morphCache.Save())
+
+# resident NLP tools, started at first usage and restarted if they crash
+taggerPool = ToolPool(lambda: HunPosTagger(hunpostagFilePath, szegedmodelFilePath), toolPoolSize)
+analyzerPool = CachedAnalyzerPool(ToolPool(lambda: OcamorphAnalyzer(ocamorphFilePath), toolPoolSize), morphCache)
+
+# same stopword and number filtering as at training, loaded once
+sentenceFilter = SentenceFilter(stopwordsFilePath)
+
+# difference of probabilities below which sentiment is neutral
+neutralBand = 0.15
+# stems of words for fast mode, words not yet in morphological analysis cache are looked up again after 'stemRetryInterval' seconds
+stemCacheSize = 100000
+stemRetryInterval = 60
+stemCache = LRUCache(stemCacheSize)
+
+
+def LoadModel(filePath):
+	# version of model is the hash of model file, e.g. cached results are valid only for same version
+	modificationTime = os.path.getmtime(filePath)
+	version = hashlib.md5(open(filePath, 'rb').read()).hexdigest()
+
+	model = None
+	if compactModelEnabled:
+		try:
+			model = LoadCompactModel(CompactModelPath(filePath), version)
+		except Exception:
+			# broken artifact, pickled model is used
+			logger.exception("Compact_model_exception")
+	if model is None:
+		model = joblib.load(filePath, mmap_mode=modelMmapMode)
+	return (model, version, modificationTime)
+
+# load machine learning model at import, a preforking server shares it between its workers
+(ML_model, ModelVersion, modelModificationTime) = LoadModel(MLmodelFilePath)
+# model and its version are swapped together as one tuple, requests pin it (see 'PinModel')
+currentModel = (ML_model, ModelVersion)
+requestModel = threading.local()
+modelWatcherPid = None
+modelLock = threading.Lock()
+
+
+def ReloadModel():
+	# changed model file is loaded next to the old model, requests in progress finish with the old one
+	global ML_model, ModelVersion, currentModel, modelModificationTime
+	with modelLock:
+		try:
+			if os.path.getmtime(MLmodelFilePath) == modelModificationTime:
+				return False
+			(model, version, modificationTime) = LoadModel(MLmodelFilePath)
+		except Exception:
+			# e.g. file is being written, it is tried again at next check
+			logger.exception("Model_reload_exception")
+			return False
+
+		# requests in progress keep the pinned (model, version) pair, so their results are cached under the version of their model
+		currentModel = (model, version)
+		ML_model = model
+		ModelVersion = version
+		modelModificationTime = modificationTime
+	logger.warning("Model reloaded, version: " + version)
+	return True
+
+
+def PinModel():
+	requestModel.pinned = currentModel
+
+
+def UnpinModel():
+	requestModel.pinned = None
+
+
+def RequestModel():
+	return getattr(requestModel, 'pinned', None) or currentModel
+
+
+def WatchModel():
+	# starts model watcher thread once per process, threads do not survive fork of server workers
+	global modelWatcherPid
+	if modelReloadInterval is None or modelWatcherPid == os.getpid():
+		return
+	with modelLock:
+		if modelWatcherPid == os.getpid():
+			return
+		watcher = threading.Thread(target=ModelWatcher)
+		watcher.daemon = True
+		watcher.start()
+		modelWatcherPid = os.getpid()
+
+
+def ModelWatcher():
+	while True:
+		time.sleep(modelReloadInterval)
+		ReloadModel()
 
 
 def MorphAnalysis(inputString):
-	# part-of-speech tagging on input
-	cmd = 'echo ' + inputString.encode('latin2') + ' | huntoken | ' + xmlparserFilePath + ' | ' + hunpostagFilePath + ' ' + szegedmodelFilePath + ' > ' + posFilePath
-	p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-	(pos_out, err) = p.communicate()
-	
-	# morphological analysis on input
-	cmd = 'echo ' + inputString.encode('latin2') + ' | huntoken | ' + xmlparserFilePath + ' | ocamorph --bin ' + ocamorphFilePath + ' > ' + morphFilePath			
-	p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-	(morph_out, err) = p.communicate()
-
-	# morph disambiguation with stemmed form without POS tagging
-	(wordsArray, disArray) = MorphologicalDisambiguation(posFilePath, morphFilePath)
-	stemmedArray = StemmedForm(disArray, 0)
+	# tokenization on input
+	with Timed('tokenize'):
+		if tokenizer == 'huntoken':
+			sentences = NLPToolPool.Tokenize(inputString)
+		else:
+			sentences = Tokenizer.Tokenize(inputString)
+
+	return AnalyzeSentences(sentences)
+
+
+def MorphAnalysisBatch(inputStrings, errors=None):
+	# without 'errors' any failure is raised, with it failed documents are None and errors[index] is their error message
+	if len(inputStrings) == 0:
+		return []
+
+	# tokenization of every document at once (with one huntoken call)
+	with Timed('tokenize'):
+		try:
+			if tokenizer == 'huntoken':
+				documents = NLPToolPool.TokenizeBatch(inputStrings)
+			else:
+				documents = Tokenizer.TokenizeBatch(inputStrings)
+		except Exception:
+			if errors is None:
+				raise
+			# a document is wrong, every document is tokenized separately to find it
+			tokenize = NLPToolPool.Tokenize if tokenizer == 'huntoken' else Tokenizer.Tokenize
+			documents = [DocumentOrError(tokenize, inputString, index, errors) for index, inputString in enumerate(inputStrings)]
+
+	# tagging and analysis of all sentences at once
+	try:
+		stemmedArrays = AnalyzeDocuments([sentences for sentences in documents if sentences is not None])
+	except Exception:
+		if errors is None:
+			raise
+		stemmedArrays = [DocumentOrError(lambda sentences: AnalyzeDocuments([sentences])[0], sentences, index, errors)
+			for index, sentences in enumerate(documents) if sentences is not None]
+
+	# failed documents are None at their original position
+	stemmedArrays = iter(stemmedArrays)
+	return [next(stemmedArrays) if sentences is not None else None for sentences in documents]
+
+
+def AnalyzeDocuments(documents):
+	# tagging and analysis of sentences of every document at once, split back by document
+	stemmedArray = AnalyzeSentences([sentence for sentences in documents for sentence in sentences])
+	if len(stemmedArray) != sum(len(sentences) for sentences in documents):
+		raise ValueError('Morphological disambiguation failed on batch input')
+
+	stemmedArrays = []
+	position = 0
+	for sentences in documents:
+		stemmedArrays.append(stemmedArray[position:position + len(sentences)])
+		position += len(sentences)
+
+	return stemmedArrays
+
+
+def DocumentOrError(function, document, index, errors):
+	try:
+		return function(document)
+	except Exception as error:
+		logger.warning("Document " + str(index) + " of batch can not be analyzed: " + repr(error))
+		errors[index] = 'Document can not be analyzed: ' + type(error).__name__
+		return None
+
+
+def FastStem(word):
+	# first analysis of ocamorph without POS disambiguation, word itself if it was never analyzed
+	stem = stemCache.Get(word)
+	if stem is None:
+		analyses = morphCache.Get(word)
+		if analyses is None:
+			stemCache.Put(word, word, time.time() + stemRetryInterval)
+			return word
+		stem = analyses[0].split('/')[0] if len(analyses) > 0 and analyses[0] != 'UNKNOWN' else word
+		stemCache.Put(word, stem)
+	return stem
+
+
+def MorphAnalysisFast(inputString):
+	# in-process tokenization and cached stems, no external tool is called
+	with Timed('tokenize'):
+		sentences = Tokenizer.Tokenize(inputString)
+
+	with Timed('fast_stems'):
+		stemmedArray = [[FastStem(word) for word in sentence] for sentence in sentences]
+
+	with Timed('filter'):
+		stemmedArray = list(sentenceFilter.Filter([word.lower() for word in sent] for sent in stemmedArray))
+
+	return stemmedArray
+
+
+def AnalyzeSentences(sentences):
+	# part-of-speech tagging and morphological analysis run at the same time on the same tokens
+	(posLines, morphLines) = RunInParallel([
+		(TimedFunction('hunpos', taggerPool.Run), (sentences,)),
+		(TimedFunction('ocamorph', analyzerPool.Run), (sentences,)),
+	])
+
+	# morph disambiguation with stemmed form without POS tagging, whole request is kept in memory
+	with Timed('disambiguation'):
+		(wordsArray, disArray) = MorphologicalDisambiguationLines(posLines, morphLines)
+		stemmedArray = StemmedForm(disArray, 0)
 	
-	# convert every word to lowercase
-	stemmedArray = [[word.lower() for word in sent] for sent in stemmedArray]
+	# convert every word to lowercase, then filter stopwords and numbers
+	with Timed('filter'):
+		stemmedArray = list(sentenceFilter.Filter([word.lower() for word in sent] for sent in stemmedArray))
 
 	return stemmedArray
 
 
+def LoadNER():
+	global polyglotText
+	with nerLock:
+		if polyglotText is None:
+			from polyglot.text import Text
+			# first entity extraction loads embeddings and NER models into memory
+			Text(u'Budapest Magyarország fővárosa.', hint_language_code='hu').entities
+			polyglotText = Text
+	return polyglotText
+
+
 def NER(inputString):
 	locationList = []
 	personList = []
 	organizationList = []
 
-	text = Text(inputString)
+	with Timed('ner'):
+		Text = LoadNER()
+		text = Text(inputString)
 
-	# select entities into categories
-	for sent in text.sentences:
-		for entity in sent.entities:
-			if 'PER' in entity.tag:
-				personList.append(entity)
-			elif 'LOC' in entity.tag:
-				locationList.append(entity)
-			elif 'ORG' in entity.tag:
-				organizationList.append(entity)
+		# select entities into categories
+		for sent in text.sentences:
+			for entity in sent.entities:
+				if 'PER' in entity.tag:
+					personList.append(entity)
+				elif 'LOC' in entity.tag:
+					locationList.append(entity)
+				elif 'ORG' in entity.tag:
+					organizationList.append(entity)
 
 	return (locationList, personList, organizationList)
 
 
 def SentimentScore(stemmedArray):
-	# convert to countvectorizer digestible format
-	List = CountVectorizerTransform_input(stemmedArray)
+	return SentimentScoreBatch([stemmedArray])[0]
 
-	# get sentiment probabilities
-	negProb, posProb = ML_model.predict_proba(List)[0]
-	
+
+def SentimentScoreBatch(stemmedArrays):
+	# convert to countvectorizer digestible format, first sentence of every document is scored
+	List = []
+	for stemmedArray in stemmedArrays:
+		converted = CountVectorizerTransform_input(stemmedArray)
+		List.append(converted[0] if len(converted) > 0 else '')
+
+	# get sentiment probabilities for whole batch at once
+	scores = []
+	if len(List) == 0:
+		return scores
+	(model, version) = RequestModel()
+	with Timed('predict_proba'):
+		probabilities = model.predict_proba(List)
+	for negProb, posProb in probabilities:
+		# return sentiment category and probalities
+		scores.append((SentimentCategory(negProb, posProb), negProb, posProb))
+
+	return scores
+
+
+def SentimentCategory(negProb, posProb):
 	# calculate neutral if difference is small
-	if abs(negProb-posProb) < 0.15:
+	if abs(negProb-posProb) < neutralBand:
 		sentiment = 'neutral'
 	elif posProb > negProb:
 		sentiment = 'positive'
 	else:
 		sentiment = 'negative'	
 
-	# return sentiment category and probalities
-	return (sentiment, negProb, posProb)
+	return sentiment
 
 
-def OverallSentiment(inputString, morphAnalyzed, sentimentList):
-	# get sentiment scores for overall
-	(sent, negProb, posProb) = SentimentScore(morphAnalyzed)
-	
+def OverallScore(inputString, sent, negProb, posProb):
 	overallScore = {
 		'input sentence': inputString,
 		'sentiment': sent,
@@ -103,35 +360,98 @@ def OverallSentiment(inputString, morphAnalyzed, sentimentList):
 		'positive probalitiy': posProb,
     }
 
+	return overallScore
+
+
+def OverallSentiment(inputString, morphAnalyzed, sentimentList):
+	# get sentiment scores for overall
+	(sent, negProb, posProb) = SentimentScore(morphAnalyzed)
+	
+	sentimentList.append(OverallScore(inputString, sent, negProb, posProb))
+
+
+def OverallSentimentBatch(inputStrings, morphAnalyzedList, sentimentList):
+	# get sentiment scores for every document with one prediction
+	scores = SentimentScoreBatch(morphAnalyzedList)
+
+	for inputString, (sent, negProb, posProb) in zip(inputStrings, scores):
+		sentimentList.append(OverallScore(inputString, sent, negProb, posProb))
+
+
+
+def OverallSentimentFast(inputString, sentimentList):
+	# score of lexicon and model on cached stems, neutral scores are checked with full analysis
+	(sent, negProb, posProb) = SentimentScore(MorphAnalysisFast(inputString))
+	mode = 'fast'
+	if abs(negProb-posProb) < neutralBand:
+		(sent, negProb, posProb) = SentimentScore(MorphAnalysis(inputString))
+		mode = 'full'
+
+	overallScore = OverallScore(inputString, sent, negProb, posProb)
+	overallScore['mode'] = mode
 	sentimentList.append(overallScore)
 
 	
-def EntitySentimentScore(stemmedArray, entity, span):
-	for i in range(0,int(len(stemmedArray))):
-		try:
+def EntityWindow(stemmedArray, sentenceIndexes, entity, span):
+	# context of first occurence of entity without entity itself, None if entity is not in analyzed text
+	try:
+		word = entity[0].encode('latin2').lower()
+	except UnicodeEncodeError:
+		return None
+
+	for sentence, index in izip(stemmedArray, sentenceIndexes):
+		if word in index:
 			# determine boundaries for entity
-			EntityStart = stemmedArray[i].index(entity[0].encode('latin2').lower())
+			EntityStart = index[word]
 			EntityEnd = EntityStart + int(len(entity))
 			Start = EntityStart-span if EntityStart>span else 0
-			End = EntityEnd+span if EntityEnd<(len(stemmedArray[i])-span) else len(stemmedArray[0])
-	
-			# get score for entity
-			return SentimentScore([stemmedArray[i][Start:EntityStart] + stemmedArray[i][EntityEnd:End]])
-		except:
-			pass
+			End = EntityEnd+span if EntityEnd<(len(sentence)-span) else len(sentence)
+			return sentence[Start:EntityStart] + sentence[EntityEnd:End]
+
+	return None
+
+
+def EntitySentimentScore(stemmedArray, entity, span):
+	window = EntityWindow(stemmedArray, [sentence_index(sentence) for sentence in stemmedArray], entity, span)
+	if window is None:
+		return None
+
+	# get score for entity
+	return SentimentScore([window])
 
 
 def NERsentiment(stemmedArray, entityList, entityType, sentimentList):
-	for i in range(0,len(entityList)):
-		# get sentiment score for every entity		
-		(sentiment, negProb, posProb) = EntitySentimentScore(stemmedArray, entityList[i], 3)
+	NERsentimentBatch(stemmedArray, [(entityList, entityType)], sentimentList)
+
+
+def NERsentimentBatch(stemmedArray, typedEntityLists, sentimentList):
+	with Timed('entity_windows'):
+		# word positions are indexed once per sentence
+		sentenceIndexes = [sentence_index(sentence) for sentence in stemmedArray]
 
-		entity = {
-			'entity': ' '.join(entityList[i]),
+		# context window of every entity, entities not found in analyzed text are skipped
+		entities = []
+		windows = []
+		for entityList, entityType in typedEntityLists:
+			for entity in entityList:
+				window = EntityWindow(stemmedArray, sentenceIndexes, entity, 3)
+				if window is not None:
+					entities.append((entity, entityType))
+					windows.append([window])
+
+	# get sentiment score for every entity with one prediction
+	for (entity, entityType), (sentiment, negProb, posProb) in zip(entities, SentimentScoreBatch(windows)):
+		sentimentList.append({
+			'entity': ' '.join(entity),
 			'entity type': entityType,
 			'sentiment': sentiment,
 			'negative prob': negProb,
 			'positive prob': posProb
-		}
+		})
+
 
-		sentimentList.append(entity)
+def CacheStats():
+	return {
+		'morphological analysis': morphCache.Stats(),
+		'fast stems': stemCache.Stats(),
+	}
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+import os, sys, csv, json, time, shutil, getopt, platform, tempfile, threading
+from multiprocessing import Process, Queue, cpu_count
+from distutils.spawn import find_executable
+from os.path import expanduser
+import numpy
+
+from Benchmark_DimensionReduction import ReadCorpus, PeakMemoryMB
+
+""" End-to-end benchmark of inference and training paths on OpinHuBank corpus.
+Results are written as JSON, so runs can be compared with each other for regressions.
+
+Inference: throughput and latency percentiles of MorphAnalysis, MorphAnalysisBatch, SentimentScore(Batch)
+and NERsentiment at several batch sizes and concurrency levels (number of threads). Latency is measured
+per call, a call processes one batch.
+REST: same for /sentiment, /sentiment_batch and /sentiment_verbose through Flask's test client, response
+cache is switched off. /sentiment_verbose is measured only if Polyglot is installed.
+Training: fit time and peak RSS of every pipeline factory, each of them in a separate process.
+
+If huntoken, hunpos-tag or ocamorph is not installed, a stand-in script is used instead, which gives back
+output in the same format (every word is a noun). Latencies with stand-ins are not comparable with real
+ones, stand-ins used are listed in the output. Morphological analysis cache is cleared before every
+measurement, so each of them starts cold, but words repeated within a measurement are answered from the
+cache (as in a running server), only first occurrences go through the tools.
+
+Usage:
+	python Benchmark.py [-n <documents>] [-r <corpus repetition for training>] [-m <inference,rest,training>] [-o <output json>]
+"""
+
+# Get home folder
+homeFolder = expanduser('~')
+
+corpusPath = homeFolder + '/SentimentAnalysisHUN-master/resources/SentimentCorpus/OpinHuBank_20130106.csv'
+
+batchSizes = [1, 8, 32]
+concurrencyLevels = [1, 4, 8]
+
+# stand-ins of NLP tools, they read and write same formats as the real tools
+standInScripts = {
+	'huntoken': r'''
+import sys, re
+text = sys.stdin.read().decode('latin2')
+print '<?xml version="1.0" encoding="ISO-8859-2"?>'
+print '<cesDoc>'
+for paragraph in re.split(r'\n\s*\n', text):
+	for sentence in re.split(r'(?<=[.!?])\s+', paragraph.strip()):
+		if sentence == '':
+			continue
+		print '<s>'
+		for token in re.findall(r'\w+|[^\w\s]', sentence, re.U):
+			tag = 'w' if re.match(r'\w', token, re.U) else 'c'
+			print ('<%s>%s</%s>' % (tag, token, tag)).encode('latin2')
+		print '</s>'
+print '</cesDoc>'
+''',
+	'hunpos-tag': r'''
+import sys
+while True:
+	line = sys.stdin.readline()
+	if line == '':
+		break
+	word = line.rstrip('\n')
+	sys.stdout.write(word + '\tNOUN\n' if word != '' else '\n')
+	if word == '':
+		sys.stdout.flush()
+''',
+	'ocamorph': r'''
+import sys
+while True:
+	line = sys.stdin.readline()
+	if line == '':
+		break
+	word = line.rstrip('\n')
+	if word == 'thisistheending' or not word.decode('latin2').isalpha():
+		sys.stdout.write('> ' + word + '\nUNKNOWN\n')
+	else:
+		lower = word.decode('latin2').lower().encode('latin2')
+		sys.stdout.write('> ' + word + '\n' + lower + '/NOUN\n')
+	sys.stdout.flush()
+''',
+}
+
+
+def ReadDocuments(FilePath, number):
+	# sentences and their entity (as a word list) from original corpus
+	documents = []
+
+	corpusfile = open(FilePath, 'rb')
+	reader = csv.reader(corpusfile, delimiter=',')
+	# Skip header
+	next(reader, None)
+
+	for line in reader:
+		documents.append((line[4].decode('latin2'), line[3].decode('latin2').split()))
+		if len(documents) == number:
+			break
+
+	corpusfile.close()
+
+	return documents
+
+
+def WriteStandIn(directory, name):
+	filePath = os.path.join(directory, name)
+	standInfile = open(filePath, 'w')
+	standInfile.write('#!' + sys.executable + '\n' + standInScripts[name])
+	standInfile.close()
+	os.chmod(filePath, 0755)
+	return filePath
+
+
+def InstallStandIns(Application_functions, directory):
+	# stand-ins are used only for tools which are not installed
+	standIns = []
+
+	if find_executable('huntoken') is None:
+		WriteStandIn(directory, 'huntoken')
+		standIns.append('huntoken')
+	if not os.access(Application_functions.hunpostagFilePath, os.X_OK):
+		Application_functions.hunpostagFilePath = WriteStandIn(directory, 'hunpos-tag')
+		standIns.append('hunpos-tag')
+	if find_executable('ocamorph') is None or not os.path.isfile(Application_functions.ocamorphFilePath):
+		WriteStandIn(directory, 'ocamorph')
+		standIns.append('ocamorph')
+
+	os.environ['PATH'] = directory + os.pathsep + os.environ['PATH']
+	return standIns
+
+
+def Result(name, batchSize, concurrency, documents, seconds, latencies):
+	(p50, p90, p99) = numpy.percentile(latencies, [50, 90, 99]) if len(latencies) > 0 else (0.0, 0.0, 0.0)
+	return {
+		'name': name,
+		'batch size': batchSize,
+		'concurrency': concurrency,
+		'documents': documents,
+		'seconds': seconds,
+		'documents per second': documents / seconds if seconds > 0 else 0.0,
+		'latency p50 (ms)': p50 * 1000,
+		'latency p90 (ms)': p90 * 1000,
+		'latency p99 (ms)': p99 * 1000,
+	}
+
+
+def MeasureLoad(name, function, documents, batchSize, concurrency):
+	# documents are split into batches, 'concurrency' threads call function with one batch at a time
+	batches = iter([documents[i:i+batchSize] for i in range(0, len(documents), batchSize)])
+	lock = threading.Lock()
+	latencies = []
+	errors = []
+
+	def Worker():
+		while True:
+			with lock:
+				batch = next(batches, None)
+			if batch is None:
+				return
+			start = time.time()
+			try:
+				function(batch)
+			except Exception as error:
+				errors.append(str(error))
+				continue
+			latencies.append(time.time() - start)
+
+	threads = [threading.Thread(target=Worker) for i in range(0, concurrency)]
+	start = time.time()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	seconds = time.time() - start
+
+	result = Result(name, batchSize, concurrency, len(documents), seconds, latencies)
+	result['errors'] = len(errors)
+	print >> sys.stderr, '%s\tbatch %d\tthreads %d\t%.1f docs/s\tp50 %.1f ms\tp99 %.1f ms\terrors %d' % (name, batchSize, concurrency,
+		result['documents per second'], result['latency p50 (ms)'], result['latency p99 (ms)'], len(errors))
+	return result
+
+
+def BenchmarkInference(Application_functions, documents):
+	F = Application_functions
+	texts = [text for (text, entity) in documents]
+	results = []
+
+	def Cold(function):
+		# every measurement starts with empty morphological analysis cache, repeated words hit it later on
+		F.morphCache.Clear()
+		return function
+
+	for concurrency in concurrencyLevels:
+		results.append(MeasureLoad('MorphAnalysis', Cold(lambda batch: [F.MorphAnalysis(text) for text in batch]), texts, 1, concurrency))
+	for batchSize in batchSizes:
+		results.append(MeasureLoad('MorphAnalysisBatch', Cold(F.MorphAnalysisBatch), texts, batchSize, 1))
+
+	# scoring is measured on analyzed documents
+	analyzed = F.MorphAnalysisBatch(texts)
+	for concurrency in concurrencyLevels:
+		results.append(MeasureLoad('SentimentScore', lambda batch: [F.SentimentScore(stemmedArray) for stemmedArray in batch], analyzed, 1, concurrency))
+	for batchSize in batchSizes:
+		results.append(MeasureLoad('SentimentScoreBatch', F.SentimentScoreBatch, analyzed, batchSize, 1))
+
+	# entity of corpus row is scored in its analyzed sentence
+	entityDocuments = [(stemmedArray, entity) for stemmedArray, (text, entity) in zip(analyzed, documents)]
+	for concurrency in concurrencyLevels:
+		results.append(MeasureLoad('NERsentiment', lambda batch: [F.NERsentiment(stemmedArray, [entity], 'person', []) for (stemmedArray, entity) in batch], entityDocuments, 1, concurrency))
+
+	return results
+
+
+def BenchmarkREST(Application, documents):
+	texts = [text for (text, entity) in documents]
+	Application.responseCacheEnabled = False
+	clients = threading.local()
+	results = []
+
+	def Post(url, data):
+		# every thread has its own test client
+		if not hasattr(clients, 'client'):
+			clients.client = Application.app.test_client()
+		response = clients.client.post(url, data=json.dumps(data), content_type='application/json')
+		if response.status_code != 201:
+			raise ValueError(url + ' answered ' + str(response.status_code))
+
+	endpoints = ['/sentiment']
+	try:
+		Application.LoadNER()
+		endpoints.append('/sentiment_verbose')
+	except ImportError:
+		print >> sys.stderr, 'Polyglot is not installed, /sentiment_verbose is skipped'
+
+	for url in endpoints:
+		for concurrency in concurrencyLevels:
+			Application.Application_functions.morphCache.Clear()
+			results.append(MeasureLoad(url, lambda batch, url=url: [Post(url, {'sentence': text}) for text in batch], texts, 1, concurrency))
+	for batchSize in batchSizes:
+		Application.Application_functions.morphCache.Clear()
+		results.append(MeasureLoad('/sentiment_batch', lambda batch: Post('/sentiment_batch', {'sentences': batch}), texts, batchSize, 1))
+
+	return results
+
+
+def MeasureFit(factoryName, kwargs, repetition, results):
+	from FeatureExtraction import SentimentDictionary_Read
+	import Classifier
+	factory = getattr(Classifier, factoryName)
+
+	(sentences, labels) = ReadCorpus(corpusPath, repetition)
+	pipeline = factory(SentimentDictionary_Read(Classifier.posLexiconPath), SentimentDictionary_Read(Classifier.negLexiconPath), **kwargs)
+
+	memoryBefore = PeakMemoryMB()
+	start = time.time()
+	pipeline.fit(sentences, labels)
+	fitTime = time.time() - start
+
+	results.put((len(sentences), fitTime, memoryBefore, PeakMemoryMB()))
+
+
+def BenchmarkTraining(repetition):
+	factories = [
+		('pipeline_TFIDF_NaiveBayes', {}),
+		('pipeline_Hashing_NaiveBayes', {}),
+		('pipeline_PCA_SVM', {'sparse': False}),
+		('pipeline_PCA_SVM', {'sparse': True}),
+		('pipeline_PCA_Regression', {'sparse': False}),
+		('pipeline_PCA_Regression', {'sparse': True}),
+	]
+
+	results = []
+	for factoryName, kwargs in factories:
+		queue = Queue()
+		process = Process(target=MeasureFit, args=(factoryName, kwargs, repetition, queue))
+		process.start()
+		process.join()
+
+		result = {'pipeline': factoryName, 'parameters': kwargs, 'exit code': process.exitcode}
+		if process.exitcode == 0:
+			(sentenceNumber, fitTime, memoryBefore, memoryPeak) = queue.get()
+			result.update({'sentences': sentenceNumber, 'fit seconds': fitTime, 'peak RSS before fit (MB)': memoryBefore, 'peak RSS (MB)': memoryPeak})
+			print >> sys.stderr, '%s %s\t%d sentences\tfit %.2f s\tpeak RSS %.1f MB' % (factoryName, kwargs, sentenceNumber, fitTime, memoryPeak)
+		else:
+			print >> sys.stderr, '%s %s\tfailed with exit code %s' % (factoryName, kwargs, process.exitcode)
+		results.append(result)
+
+	return results
+
+
+def main():
+	usage = "Please use [-n <documents>] [-r <corpus repetition for training>] [-m <inference,rest,training>] [-o <output json>]"
+	try:
+		(opts, args) = getopt.getopt(sys.argv[1:], 'n:r:m:o:')
+	except getopt.GetoptError as error:
+		print str(error) + ' ' + usage
+		sys.exit(1)
+
+	options = dict(opts)
+	documentNumber = int(options.get('-n', 200))
+	repetition = int(options.get('-r', 1))
+	modes = options.get('-m', 'inference,rest,training').split(',')
+
+	output = {
+		'environment': {
+			'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+			'python': platform.python_version(),
+			'platform': platform.platform(),
+			'cpus': cpu_count(),
+			'documents': documentNumber,
+			'corpus repetition': repetition,
+		},
+	}
+
+	# training processes are forked before NLP tools and server threads are started
+	if 'training' in modes:
+		output['training'] = BenchmarkTraining(repetition)
+
+	if 'inference' in modes or 'rest' in modes:
+		import Application_functions
+		standInDir = tempfile.mkdtemp(prefix='SentimentAnalysisHUN_benchmark_')
+		output['environment']['stand-in tools'] = InstallStandIns(Application_functions, standInDir)
+		documents = ReadDocuments(corpusPath, documentNumber)
+
+		if 'inference' in modes:
+			output['inference'] = BenchmarkInference(Application_functions, documents)
+		if 'rest' in modes:
+			import Application
+			output['rest'] = BenchmarkREST(Application, documents)
+
+		# benchmark does not overwrite persisted analyses of the server
+		Application_functions.morphCache.modified = False
+		Application_functions.taggerPool.Shutdown()
+		Application_functions.analyzerPool.Shutdown()
+		shutil.rmtree(standInDir)
+
+	if '-o' in options:
+		outfile = open(options['-o'], 'w')
+		json.dump(output, outfile, indent=1, sort_keys=True)
+		outfile.close()
+	else:
+		print json.dumps(output, indent=1, sort_keys=True)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import csv, time, resource, getopt, sys
+from multiprocessing import Process, Queue
+from os.path import expanduser
+
+from FeatureExtraction import SentimentDictionary_Read
+from Pipeline_PCA_SVM import pipeline_PCA_SVM
+from Pipeline_PCA_Regression import pipeline_PCA_Regression
+
+""" Benchmark of dense (Densifier + PCA) and sparse (TruncatedSVD) dimension reduction
+modes of 'pipeline_PCA_SVM' and 'pipeline_PCA_Regression' on OpinHuBank corpus.
+Every measurement runs in a separate process, so peak memory (RSS) of one mode
+does not influence the other.
+
+Sentences of the original corpus are used without morphological analysis, because
+only vectorization and dimension reduction are measured. Corpus can be repeated
+with option -r to simulate larger corpora.
+
+Usage:
+	python Benchmark_DimensionReduction.py [-r <corpus repetition>]
+"""
+
+# Get home folder
+homeFolder = expanduser('~')
+
+corpusPath = homeFolder + '/SentimentAnalysisHUN-master/resources/SentimentCorpus/OpinHuBank_20130106.csv'
+posLexiconPath = homeFolder + '/SentimentAnalysisHUN-master/resources/SentimentLexicons/PrecoPos.txt'
+negLexiconPath = homeFolder + '/SentimentAnalysisHUN-master/resources/SentimentLexicons/PrecoNeg.txt'
+
+
+def ReadCorpus(FilePath, repetition):
+	sentences = []
+	labels = []
+
+	corpusfile = open(FilePath, 'rb')
+	reader = csv.reader(corpusfile, delimiter=',')
+	# Skip header
+	next(reader, None)
+
+	for line in reader:
+		reviewScore = 0
+		for i in range(6,11):
+			if line[i] == '-1':
+				reviewScore -= 1
+			elif line[i] == '1':
+				reviewScore += 1
+
+		sentences.append(line[4])
+		if reviewScore > 0:
+			labels.append('positive')
+		elif reviewScore < 0:
+			labels.append('negative')
+		else:
+			labels.append('neutral')
+
+	corpusfile.close()
+
+	return (sentences * repetition, labels * repetition)
+
+
+def PeakMemoryMB():
+	# ru_maxrss is given in kilobytes on linux
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def Measure(pipelineFactory, sparse, repetition, results):
+	(sentences, labels) = ReadCorpus(corpusPath, repetition)
+	pipeline = pipelineFactory(SentimentDictionary_Read(posLexiconPath), SentimentDictionary_Read(negLexiconPath), sparse=sparse)
+
+	memoryBefore = PeakMemoryMB()
+	start = time.time()
+	pipeline.fit(sentences, labels)
+	fitTime = time.time() - start
+
+	results.put((len(sentences), fitTime, memoryBefore, PeakMemoryMB()))
+
+
+def main():
+	repetition = 1
+	(opts, args) = getopt.getopt(sys.argv[1:], 'r:')
+	for opt, arg in opts:
+		if opt == '-r':
+			repetition = int(arg)
+
+	print "pipeline\tmode\tsentences\tfit time (s)\tpeak RSS before fit (MB)\tpeak RSS (MB)"
+	for pipelineFactory in [pipeline_PCA_SVM, pipeline_PCA_Regression]:
+		for sparse in [False, True]:
+			results = Queue()
+			process = Process(target=Measure, args=(pipelineFactory, sparse, repetition, results))
+			process.start()
+			process.join()
+
+			mode = 'sparse' if sparse else 'dense'
+			if process.exitcode != 0:
+				print pipelineFactory.__name__ + '\t' + mode + '\tfailed with exit code ' + str(process.exitcode)
+				continue
+
+			(sentenceNumber, fitTime, memoryBefore, memoryPeak) = results.get()
+			print '%s\t%s\t%d\t%.2f\t%.1f\t%.1f' % (pipelineFactory.__name__, mode, sentenceNumber, fitTime, memoryBefore, memoryPeak)
+
+if __name__ == '__main__':
+	main()
@@ -1,5 +1,7 @@
 # Import basics libs
-import csv
+import os, csv, time, shutil, tempfile
+from itertools import izip, islice, tee
+import numpy
 from numpy import array
 from numpy import recarray
 from math import sqrt
@@ -8,18 +10,23 @@ from os.path import expanduser
 
 # Import sklearn functions
 from sklearn.metrics import classification_report, f1_score, accuracy_score, confusion_matrix, mean_squared_error, mean_absolute_error
-from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split, learning_curve
+from sklearn.model_selection import GridSearchCV, RandomizedSearchCV, ParameterGrid, StratifiedKFold, StratifiedShuffleSplit, train_test_split, learning_curve
+from sklearn.utils import safe_indexing
 from sklearn.externals import joblib
 
 # Import functions from project files
-from Morphological_Disambiguation import MorphologicalDisambiguation, StemmedForm
-from Postprocess import StopWordFilter, NumberFilter, NER_Dictionary, NERfilter
-from FeatureExtraction import SentimentDictionary_Read, n_gram, replace_if_occurances, get_words_from_array
+from Morphological_Disambiguation import MorphologicalDisambiguation, IterMorphologicalDisambiguation, StemmedForm, IterStemmedForm
+from Postprocess import SentenceFilter, NER_Dictionary
+from FeatureExtraction import SentimentDictionary_Read, ReadCorpusIntoArray, n_gram, iter_n_gram
+from StageCache import StageCache
+from CompactModel import ExportCompactModel, CompactModelPath, FileVersion
+from Vocabulary import EncodedSentences
 
 # Import pipelines from external project files
 from Pipeline_PCA_SVM import pipeline_PCA_SVM, getparams_PCA_SVM 
 from Pipeline_PCA_Regression import pipeline_PCA_Regression, getparams_PCA_Regression
 from Pipeline_TFIDF_NaiveBayes import pipeline_TFIDF_NaiveBayes, getparams_TFIDF_NaiveBayes
+from Pipeline_Hashing_NaiveBayes import pipeline_Hashing_NaiveBayes, getparams_Hashing_NaiveBayes
 
 
 # GLOBAL FUNCTIONS FOR CLASSIFICATION
@@ -36,10 +43,21 @@ Functions:
 		- FilePath: preprocessed sentiment corpus filepath
 		- RatingsReduction: option (0) [-5,5] discret values, with (1) positive/neutral/negative scores
 
-- savePredictor: save machine learning model to a file
+- IterRatingsFromCorpus: streaming version of GetRatingsFromCorpus
+
+- iter_chunks: splits a stream into lists of 'chunkSize' elements
+
+- savePredictor: save machine learning model to a file, and its compact artifact (CompactModel.py) if pipeline is supported
 	Variables:
 		- predictorName: name of predictor 
 		- predictorFilePath: where to save model
+
+- search_cv: parameter search with cross validation, exhaustive ('grid'), randomized ('random') or successive halving ('halving')
+
+- SuccessiveHalvingSearch: successive halving over GridSearchCV, candidates are compared on growing stratified samples
+	(HalvingGridSearchCV needs scikit-learn 0.24, which does not support Python 2)
+
+- print_candidates: cross validation score and mean fit time of every parameter candidate of a fitted search
 """
 
 def CountVectorizerTransform_input(inputList):
@@ -50,7 +68,10 @@ def CountVectorizerTransform_input(inputList):
 
 
 def GetRatingsFromCorpus(FilePath, RatingsReduction):
-	ratings = []
+	return list(IterRatingsFromCorpus(FilePath, RatingsReduction))
+
+
+def IterRatingsFromCorpus(FilePath, RatingsReduction):
 	corpusfile = open(FilePath,'rb')
 	csvreader = csv.reader(corpusfile, delimiter='\t')
 	
@@ -63,22 +84,114 @@ def GetRatingsFromCorpus(FilePath, RatingsReduction):
 				reviewScore += 1
 
 		if RatingsReduction == 0:			
-			ratings.append(reviewScore)
+			yield reviewScore
 		else:
 			if reviewScore > 0:
-				ratings.append('positive')
+				yield 'positive'
 			elif reviewScore < 0:
-				ratings.append('negative')
+				yield 'negative'
 			else:
-				ratings.append('neutral')
+				yield 'neutral'
 
 	corpusfile.close()
-	
-	return ratings
+
+
+def iter_chunks(iterable, chunkSize):
+	iterator = iter(iterable)
+	chunk = list(islice(iterator, chunkSize))
+	while len(chunk) > 0:
+		yield chunk
+		chunk = list(islice(iterator, chunkSize))
+
+
+def check_search_method(searchMethod):
+	if searchMethod not in ('grid', 'random', 'halving'):
+		raise ValueError("Unknown search method: " + str(searchMethod) + ", use 'grid', 'random' or 'halving'")
+
+
+class SuccessiveHalvingSearch(object):
+	# every round cross validates remaining candidates on a stratified sample, keeps best 1/'factor' of them
+	# and multiplies sample size by 'factor', last round is a GridSearchCV of at most 'factor' candidates on whole set
+	def __init__(self, estimator, params, cv, factor=3, scoring='accuracy', n_jobs=-1):
+		self.estimator = estimator
+		self.params = params
+		self.cv = cv
+		self.factor = factor
+		self.scoring = scoring
+		self.n_jobs = n_jobs
+
+	def fit(self, X, y):
+		candidates = list(ParameterGrid(self.params))
+
+		rounds = 0
+		remaining = len(candidates)
+		while remaining > self.factor:
+			remaining = -(-remaining // self.factor)
+			rounds += 1
+
+		# (samples, candidates) of every round, last one is the final search
+		self.rounds_ = []
+		for i in range(0, rounds):
+			# every fold needs a few samples of every class
+			samples = max(len(y) // self.factor ** (rounds - i), 10 * self.cv.get_n_splits() * len(set(y)))
+			if samples >= len(y):
+				break
+			(indices, rest) = next(StratifiedShuffleSplit(n_splits=1, train_size=samples, test_size=None, random_state=i).split(numpy.zeros(len(y)), y))
+			search = self.grid(candidates, False).fit(safe_indexing(X, indices), safe_indexing(y, indices))
+			self.rounds_.append((samples, len(candidates)))
+
+			order = numpy.argsort(-search.cv_results_['mean_test_score'], kind='mergesort')
+			candidates = [search.cv_results_['params'][j] for j in order[:-(-len(candidates) // self.factor)]]
+
+		self.search_ = self.grid(candidates, True).fit(X, y)
+		self.rounds_.append((len(y), len(candidates)))
+		return self
+
+	def grid(self, candidates, refit):
+		# every candidate is a grid of its own, so GridSearchCV tries exactly these ones
+		params = [dict((name, [value]) for (name, value) in candidate.items()) for candidate in candidates]
+		return GridSearchCV(self.estimator, params, refit=refit, n_jobs=self.n_jobs, scoring=self.scoring, cv=self.cv)
+
+	def __getattr__(self, name):
+		# fitted attributes (best_estimator_, best_score_, cv_results_, predict ...) are the ones of the final search
+		if name != 'search_' and 'search_' in self.__dict__:
+			return getattr(self.search_, name)
+		raise AttributeError(name)
+
+
+def search_cv(pipeline, params, searchMethod, cv, iterations=10):
+	check_search_method(searchMethod)
+	if searchMethod == 'random':
+		# sampling without replacement, so a small grid is not sampled more than its size
+		return RandomizedSearchCV(pipeline, params, n_iter=min(iterations, len(ParameterGrid(params))), refit=True, n_jobs=-1, scoring='accuracy', cv=cv)
+	elif searchMethod == 'halving':
+		# every round keeps best third of candidates and triples their training samples
+		return SuccessiveHalvingSearch(pipeline, params, cv, factor=3, scoring='accuracy', n_jobs=-1)
+	else:
+		return GridSearchCV(pipeline, params, refit=True, n_jobs=-1, scoring='accuracy', cv=cv)
+
+
+def print_candidates(search):
+	if hasattr(search, 'rounds_'):
+		print "halving rounds (samples, candidates): " + str(search.rounds_)
+	results = search.cv_results_
+	print "mean score \t std score \t mean fit time (s) \t mean score time (s) \t parameters"
+	for i in range(0, len(results['params'])):
+		print '%.4f \t %.4f \t %.3f \t %.3f \t %s' % (results['mean_test_score'][i], results['std_test_score'][i], results['mean_fit_time'][i], results['mean_score_time'][i], results['params'][i])
 
 
 def savePredictor(predictorName, predictorFilePath):
-	joblib.dump(predictorName, predictorFilePath, compress = 1)	
+	# written to a temporary file first, so a running server never loads a half written model
+	tempFilePath = predictorFilePath + '.' + str(os.getpid()) + '.tmp'
+	joblib.dump(predictorName, tempFilePath, compress = 1)	
+
+	# compact artifact gets version of new model file and is written before it, so a reloading server finds both
+	try:
+		ExportCompactModel(predictorName, CompactModelPath(predictorFilePath), FileVersion(tempFilePath))
+	except ValueError as error:
+		print "Compact model is not exported: " + str(error)
+
+	os.rename(tempFilePath, predictorFilePath)
 
 
 # MORPHOLOGICAL ANALYSIS, DISAMBIGUATION AND FILTERING
@@ -96,35 +209,123 @@ Return value:
 Usage example:
 	# POS off, N-GRAM on, N-GRAM value is +/- 5 tokens
 	morphAnalysis_and_filtering(0, 1, 5)
+
+'iter_morphAnalysis_and_filtering' is the streaming version: every stage is a generator,
+corpus is read line by line, so memory usage does not depend on corpus size.
+
+With 'encoded' sentences are given back as token ids ('Vocabulary.EncodedSentences') instead of
+space separated strings, for pipelines created with 'tokenIds=True'. 'iter_filtered_sentences' is the
+token list stream behind both formats.
+
+'cached_morphAnalysis_and_filtering' saves output of every stage to 'stageCacheDir', keyed by
+its input files and parameters, so repeated runs (e.g. only classifier parameters are changed)
+load stages from disk. It is used if 'stageCacheDir' is set, and then every stage is kept in memory as
+a list, the streaming path above is used only with 'stageCacheDir = None' ('train_out_of_core' always streams).
 """
-def morphAnalysis_and_filtering(pos_onoff, n_gram_onoff, n_gram_value):	
+def morphAnalysis_and_filtering(pos_onoff, n_gram_onoff, n_gram_value, encoded=False):	
+	if stageCacheDir is not None:
+		return cached_morphAnalysis_and_filtering(pos_onoff, n_gram_onoff, n_gram_value, encoded)
+	if encoded:
+		return EncodedSentences.FromSentences(iter_filtered_sentences(pos_onoff, n_gram_onoff, n_gram_value))
+	return list(iter_morphAnalysis_and_filtering(pos_onoff, n_gram_onoff, n_gram_value))
+
+
+def cached_morphAnalysis_and_filtering(pos_onoff, n_gram_onoff, n_gram_value, encoded=False):
+	cache = StageCache(stageCacheDir)
+
+	# keys of every stage, only the last cached stage is loaded from disk
+	disKey = cache.Key('disambiguation', None, {}, [posfilePath, morphfilePath])
+	stemKey = cache.Key('stemmed', disKey, {'withPOS': pos_onoff}, [])
+	ngramKey = cache.Key('n_gram', stemKey, {'n_gram_number': n_gram_value, 'n_gram_onoff': n_gram_onoff}, [preprocessedCorpusPath])
+	filterKey = cache.Key('filter', ngramKey, {'filterNumbers': True}, [stopwordsFilePath])
+
 	# Morphological disambiguation (wordsArray contains original words - for easier n-gram filtering, disArray for perfect output)
-	(wordsArray, disArray) = MorphologicalDisambiguation(posfilePath, morphfilePath)
-	stemmedArray = StemmedForm(disArray, 0)
-	
-	# Substitute rare words with specific label '_rare_'
-	substArray = replace_if_occurances(stemmedArray, get_words_from_array(stemmedArray), 3, '_rare_')
+	disambiguation = lambda: cache.Get(disKey, lambda: MorphologicalDisambiguation(posfilePath, morphfilePath))
+	stemmed = lambda: cache.Get(stemKey, lambda: (StemmedForm(disambiguation()[1], pos_onoff),))
+
+	# +/- n-gram around entities (whole sentence if n-gram is off), entity itself is left out
+	n_grams = lambda: cache.Get(ngramKey, lambda: (n_gram(disambiguation()[0], stemmed()[0], preprocessedCorpusPath, n_gram_value, n_gram_onoff),))
+
+	# Stopword and number filtering in one pass
+	(filtArray,) = cache.Get(filterKey, lambda: (list(SentenceFilter(stopwordsFilePath).Filter(n_grams()[0])),), encoded)
+	if encoded:
+		return filtArray
+
+	# convert filtArray to new CountVect input format	
+	return [str(' '.join(sentence)) for sentence in filtArray]
+
 
-	# 5-gram usage example
-	n_Array = n_gram(wordsArray, substArray, preprocessedCorpusPath, 5, 0)
+def iter_morphAnalysis_and_filtering(pos_onoff, n_gram_onoff, n_gram_value):
+	# convert filtered sentences to new CountVect input format	
+	for sentence in iter_filtered_sentences(pos_onoff, n_gram_onoff, n_gram_value):
+		yield str(' '.join(sentence))
+
+
+def iter_filtered_sentences(pos_onoff, n_gram_onoff, n_gram_value):
+	posfile = open(posfilePath, 'r')
+	morphfile = open(morphfilePath, 'r')
+	corpusfile = ReadCorpusIntoArray(preprocessedCorpusPath)
+
+	# Morphological disambiguation (words contain original words - for easier n-gram filtering, disambiguated for perfect output)
+	(wordsPairs, disPairs) = tee(IterMorphologicalDisambiguation(posfile, morphfile))
+	wordsSentences = (words for (words, disambiguated) in wordsPairs)
+	stemmedSentences = IterStemmedForm((disambiguated for (words, disambiguated) in disPairs), pos_onoff)
 	
-	# Stopword filtering 
-	stopwordfiltArray = StopWordFilter(n_Array, stopwordsFilePath)
+	# Rare words are substituted with specific label '_rare_' by the first step of pipelines ('RareWordReplacer')
 
-	# Number filtering
-	numfiltArray = NumberFilter(stopwordfiltArray)
+	# +/- n-gram around entities (whole sentence if n-gram is off), entity itself is left out
+	n_Sentences = iter_n_gram(izip(wordsSentences, stemmedSentences), corpusfile, n_gram_value, n_gram_onoff)
+	
+	# Stopword and number filtering in one pass
+	sentenceFilter = SentenceFilter(stopwordsFilePath)
 
 	# NER filtering can be applied
 	#(locationList, personList, organizationList) = NER_Dictionary(preprocessedCorpusPath)
-	#NERArray = NERfilter(numfiltArray, personList)
-	#NERArray = NERfilter(NERArray, locationList)
-	#NERArray = NERfilter(NERArray, organizationList)
-	#numfiltArray = NERArray
+	#sentenceFilter = SentenceFilter(stopwordsFilePath, entityLists=[personList, locationList, organizationList])
 
-	# convert filtArray to new CountVect input format	
-	filtArray = CountVectorizerTransform_input(numfiltArray)
+	for sentence in sentenceFilter.Filter(n_Sentences):
+		yield sentence
+
+	posfile.close()
+	morphfile.close()
+
+
+# OUT-OF-CORE TRAINING
+"""
+Trains 'pipeline_Hashing_NaiveBayes' chunk by chunk with partial_fit, so peak memory is bounded
+by 'chunkSize' regardless of corpus size. Every chunk is predicted before it is learned
+(progressive validation), these predictions are given back for evaluation.
+Rare word substitution is not part of this pipeline, it needs word counts of whole corpus.
+
+Return value:
+	- (fitted pipeline, true labels, predicted labels)
+"""
+def train_out_of_core(chunkSize, pos_onoff, n_gram_onoff, n_gram_value):
+	pipeline = pipeline_Hashing_NaiveBayes(SentimentDictionary_Read(posLexiconPath), SentimentDictionary_Read(negLexiconPath))
+	pipeline.set_params(**getparams_Hashing_NaiveBayes())
+
+	# vectorizers are stateless (hashing, lexicons), only classifier is trained on chunks
+	features = pipeline.named_steps['features'].fit([])
+	classifier = pipeline.named_steps['classifier']
+	# classes which occur in corpus (e.g. no neutral in posneg corpus), so model gives back same probability columns as main
+	# labels are read in a separate pass, they are small compared to documents
+	classes = sorted(set(IterRatingsFromCorpus(preprocessedCorpusPath, 1)))
 
-	return filtArray
+	testLabel = []
+	predictions = []
+	documents = izip(iter_morphAnalysis_and_filtering(pos_onoff, n_gram_onoff, n_gram_value), IterRatingsFromCorpus(preprocessedCorpusPath, 1))
+	for chunk in iter_chunks(documents, chunkSize):
+		chunkSet = [document for (document, label) in chunk]
+		chunkLabel = [label for (document, label) in chunk]
+		X = features.transform(chunkSet)
+
+		if hasattr(classifier, 'classes_'):
+			predictions.extend(classifier.predict(X))
+			testLabel.extend(chunkLabel)
+
+		classifier.partial_fit(X, chunkLabel, classes=classes)
+
+	return (pipeline, testLabel, predictions)
 
 
 # Get home folder
@@ -139,14 +340,97 @@ stopwordsFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/Stopwor
 posLexiconPath = homeFolder + '/SentimentAnalysisHUN-master/resources/SentimentLexicons/PrecoPos.txt'
 negLexiconPath = homeFolder + '/SentimentAnalysisHUN-master/resources/SentimentLexicons/PrecoNeg.txt'
 MLmodelPath = homeFolder + '/SentimentAnalysisHUN-master/src/SentAnalysisModel.pkl'
+# cache of preprocessing stages between runs, None to switch off
+# (cached stages are whole lists in memory, set None for streaming preprocessing of corpora larger than memory)
+stageCacheDir = homeFolder + '/SentimentAnalysisHUN-master/tempfiles/stagecache'
+
+# HYPERPARAMETER TUNING
+"""
+Searches parameters of every 'Pipeline*.py' pipeline with its own tuning grid ('getparams_*(tuning=True)'), and gives back
+the fitted search with the best cross validation score (among pipelines with predict_proba). Score and fit time of every
+candidate are printed.
+Fitted transformer steps of pipelines in 'cachedPipelines' are cached in a temporary directory ('memory' of
+pipelines), so candidates which differ only in classifier parameters reuse them in every fold. Cache is worth it only
+if transformer steps are slower than hashing their input and parameters: 3-fold grid search on OpinHuBank took 62 s
+without and 22 s with cache for PCA_Regression, but 27 s / 42 s for TFIDF_NaiveBayes and 688 s / 722 s for PCA_SVM,
+so it is off by default. 'compareCache' measures it for every pipeline.
+
+Variables:
+	- searchMethod: 'grid', 'random' (randomized, 'iterations' candidates per grid) or 'halving' (successive halving)
+	- cv: cross validation splitter, same folds for every pipeline
+	- cachedPipelines: names of pipelines whose transformer steps are cached, e.g. ('PCA_Regression',)
+	- compareCache: every search is run with the other cache setting as well, and both times are printed
+"""
+def tune_pipelines(trainingSet, trainingLabel, posLexicon, negLexicon, searchMethod, cv, iterations=10, tokenIds=False, cachedPipelines=(), compareCache=False):
+	check_search_method(searchMethod)
+	factories = [
+		('TFIDF_NaiveBayes', pipeline_TFIDF_NaiveBayes, {'tokenIds': tokenIds}, getparams_TFIDF_NaiveBayes(tuning=True)),
+		('PCA_SVM', pipeline_PCA_SVM, {'tokenIds': tokenIds}, getparams_PCA_SVM(tuning=True)),
+		('PCA_Regression', pipeline_PCA_Regression, {'tokenIds': tokenIds}, getparams_PCA_Regression(tuning=True)),
+	]
+
+	cacheDir = tempfile.mkdtemp(prefix='SentimentAnalysisHUN_tuning')
+	try:
+		best = None
+		for (name, factory, options, params) in factories:
+			cached = name in cachedPipelines
+			if compareCache:
+				# only measured, the search with the other cache setting is thrown away
+				start = time.time()
+				search_cv(factory(posLexicon, negLexicon, memory=None if cached else cacheDir, **options), params, searchMethod, cv, iterations).fit(trainingSet, trainingLabel)
+				print "\n" + name + (" without cache: " if cached else " with cache: ") + str(round(time.time() - start, 1)) + " s"
+
+			search = search_cv(factory(posLexicon, negLexicon, memory=cacheDir if cached else None, **options), params, searchMethod, cv, iterations)
+			start = time.time()
+			search.fit(trainingSet, trainingLabel)
+			print "\n" + name + " (" + searchMethod + " search" + (" with cache" if cached else "") + ", " + str(round(time.time() - start, 1)) + " s)"
+			print_candidates(search)
+
+			# REST API needs probabilities, e.g. SVC without probability=True is only compared
+			if not hasattr(search.best_estimator_, 'predict_proba'):
+				print "(not selectable, it has no predict_proba)"
+			elif best is None or search.best_score_ > best[1].best_score_:
+				best = (name, search)
+	finally:
+		shutil.rmtree(cacheDir, ignore_errors=True)
+
+	if best is None:
+		raise ValueError('None of the tuned pipelines has predict_proba, REST API can not use them')
+
+	print "\nBest pipeline: " + best[0] + " " + str(best[1].best_params_)
+	# cache directory is removed, so saved model does not refer to it
+	best[1].best_estimator_.set_params(memory=None)
+	return best[1]
+
 
 # MAIN FUNCTION FOR CREATING CLASSIFICATION ON TOP OF MORPHOLOGICAL ANALYSIS AND FILTERING
 """ 
 """
 def main():
 	""" Change here parameters """
-	# POS off, N-GRAM on, N-GRAM value is +/- 5 tokens
-	allSet = morphAnalysis_and_filtering(0, 1, 5)
+	# out-of-core training chunk by chunk for corpora which do not fit into memory
+	outOfCore = False
+	chunkSize = 1000
+	# sentences as token ids and TokenIdVectorizer instead of strings and CountVectorizer
+	tokenIds = False
+	# tuning compares all pipelines with 'grid', 'random' or 'halving' search, None trains TFIDF_NaiveBayes only
+	tuning = None
+	tuningIterations = 10
+	# pipelines whose transformer steps are cached during tuning, e.g. ('PCA_Regression',), see 'tune_pipelines'
+	tuningCachedPipelines = ()
+	# tuning runs every search with the other cache setting as well, to compare times
+	tuningCompareCache = False
+
+	if outOfCore:
+		# POS off, N-GRAM off (whole sentence without entity)
+		(clf, testLabel, predictions) = train_out_of_core(chunkSize, 0, 0, 5)
+		savePredictor(clf, MLmodelPath)
+		print "\nProgressive validation scores"
+		print classification_report(testLabel, predictions)
+		return
+
+	# POS off, N-GRAM off (whole sentence without entity), set N-GRAM on (0, 1, 5) for +/- 5 tokens around entity
+	allSet = morphAnalysis_and_filtering(0, 0, 5, encoded=tokenIds)
 		
 	# labels -  you can filter it to positive / negative as well
 	allLabels = GetRatingsFromCorpus(preprocessedCorpusPath, 1)
@@ -157,24 +441,32 @@ def main():
 	# load sentiment lexicons from external files
 	posLexicon = SentimentDictionary_Read(posLexiconPath)
 	negLexicon = SentimentDictionary_Read(negLexiconPath)
-	
-	""" Load functions written in 'Pipeline*.py' files """	
-	# pipeline and its parameters	
-	pipeline = pipeline_TFIDF_NaiveBayes(posLexicon, negLexicon)
-	params = getparams_TFIDF_NaiveBayes()
-
-	# gridsearch for automated machine learning with cross validation	
-	grid = GridSearchCV(
-	    pipeline,					# pipeline from above
-	    params, 					# parameters to tune via cross validation
-	    refit=True,					# fit using all available data at the end, on the best found param combination
-	    n_jobs=-1, 					# number of cores to use for parallelization; -1 for "all cores"
-	    scoring='accuracy',				# what score are we optimizing?
-	    cv=StratifiedKFold(n_splits=10).get_n_splits(trainingSet, trainingLabel),  	# what type of cross validation to use
-	)
-
-	# predictive model training
-	clf = grid.fit(trainingSet, trainingLabel)
+
+	# stratified folds for cross validation, same folds for every candidate
+	cv = StratifiedKFold(n_splits=10)
+
+	if tuning is not None:
+		# parameter search over all pipelines, best one is refitted on whole training set
+		grid = tune_pipelines(trainingSet, trainingLabel, posLexicon, negLexicon, tuning, cv, tuningIterations, tokenIds, tuningCachedPipelines, tuningCompareCache)
+		clf = grid
+	else:
+		""" Load functions written in 'Pipeline*.py' files """	
+		# pipeline and its parameters	
+		pipeline = pipeline_TFIDF_NaiveBayes(posLexicon, negLexicon, tokenIds=tokenIds)
+		params = getparams_TFIDF_NaiveBayes()
+
+		# gridsearch for automated machine learning with cross validation	
+		grid = GridSearchCV(
+		    pipeline,					# pipeline from above
+		    params, 					# parameters to tune via cross validation
+		    refit=True,					# fit using all available data at the end, on the best found param combination
+		    n_jobs=-1, 					# number of cores to use for parallelization; -1 for "all cores"
+		    scoring='accuracy',				# what score are we optimizing?
+		    cv=cv,  					# what type of cross validation to use
+		)
+
+		# predictive model training
+		clf = grid.fit(trainingSet, trainingLabel)
 
 	# save model to file
 	savePredictor(grid.best_estimator_, MLmodelPath)
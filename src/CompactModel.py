@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+import os, sys, json, shutil, getopt, hashlib
+import numpy
+from scipy.sparse import csr_matrix
+from scipy.special import logsumexp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.preprocessing import normalize
+
+import PipelineExtension
+
+""" Compact model artifact, exported next to the pickled sklearn pipeline and loaded without unpickling it.
+Word tables (vocabulary, rare word list, lexicons) are sorted byte string arrays, words are looked up with
+binary search. Idf weights and classifier parameters are raw NumPy arrays. Every array is a .npy file
+memory-mapped at load, so server worker processes share them through page cache, and loading takes
+only the time of reading the manifest.
+
+manifest.json describes the model: version of pickled model it was exported from (md5 of its file, same as
+'ModelVersion' of Application_functions.py), classes and feature configuration (steps of the feature union
+with their weights, CountVectorizer parameters, tf-idf options, lexicon columns).
+
+Supported pipelines (e.g. Pipeline_TFIDF_NaiveBayes.py and older saved models):
+- optional RareWordReplacer as first step
+- FeatureUnion of CountVectorizer or TokenIdVectorizer (with optional TfidfTransformer) and lexicon
+  features (SentDictSparseFeature, or SentDictOccurancesFeature with ItemSelector)
+- MultinomialNB classifier
+Other pipelines (e.g. PCA, hashing) are not exported, ExportCompactModel raises ValueError for them.
+
+Usage example:
+	ExportCompactModel(pipeline, 'SentAnalysisModel.compact', modelVersion)
+	model = LoadCompactModel('SentAnalysisModel.compact', modelVersion)
+	model.predict_proba(['ez egy nagyon rossz nap'])
+
+Export of an already saved model, with a check of predicted probabilities on random vocabulary words:
+	python CompactModel.py [-m <model file>] [-o <compact model directory>]
+"""
+
+# change it if artifact format changes, old artifacts are not loaded anymore
+formatVersion = 1
+manifestFileName = 'manifest.json'
+# CountVectorizer parameters used by its analyzer
+analyzerParameters = ['analyzer', 'binary', 'decode_error', 'encoding', 'input', 'lowercase', 'ngram_range', 'strip_accents', 'stop_words', 'token_pattern']
+
+
+def StringTable(words):
+	# sorted byte strings and original position of every word
+	words = list(words)
+	order = sorted(range(0, len(words)), key=lambda i: words[i])
+	table = numpy.array([words[i] for i in order] if len(words) > 0 else [''], dtype=str)
+	return (table[:len(words)], numpy.array(order, dtype=numpy.int64))
+
+
+def Lookup(table, words):
+	# position of every word in a sorted table, -1 if it is not there
+	if len(words) == 0 or len(table) == 0:
+		return numpy.zeros(len(words), dtype=numpy.int64) - 1
+	words = numpy.array(words, dtype=str)
+	positions = numpy.minimum(numpy.searchsorted(table, words), len(table)-1)
+	return numpy.where(table[positions] == words, positions, -1)
+
+
+def ExportVectorizer(name, transformer, arrays):
+	# CountVectorizer or TokenIdVectorizer, maybe followed by TfidfTransformer
+	steps = [step for (stepName, step) in transformer.steps] if hasattr(transformer, 'steps') else [transformer]
+	vectorizer = steps[0]
+	tfidf = steps[1] if len(steps) > 1 else None
+	if len(steps) > 2 or (tfidf is not None and not isinstance(tfidf, TfidfTransformer)):
+		raise ValueError('Unsupported vectorizer pipeline: ' + name)
+
+	if isinstance(vectorizer, CountVectorizer):
+		if vectorizer.preprocessor is not None or vectorizer.tokenizer is not None or callable(vectorizer.analyzer):
+			raise ValueError('CountVectorizer with custom functions is not supported: ' + name)
+		parameters = vectorizer.get_params()
+		feature = {'type': 'count', 'vectorizer': dict((key, parameters[key]) for key in analyzerParameters)}
+		words = [word.encode('utf8') for word in vectorizer.vocabulary_]
+	elif isinstance(vectorizer, PipelineExtension.TokenIdVectorizer):
+		feature = {'type': 'token ids'}
+		words = list(vectorizer.vocabulary_)
+	else:
+		raise ValueError('Unsupported vectorizer: ' + name)
+
+	(table, order) = StringTable(words)
+	columns = [vectorizer.vocabulary_[word] for word in vectorizer.vocabulary_]
+	arrays[name + '_words'] = table
+	arrays[name + '_columns'] = numpy.array(columns, dtype=numpy.int64)[order]
+	feature['columns'] = len(vectorizer.vocabulary_)
+
+	if tfidf is not None:
+		feature['tfidf'] = {'norm': tfidf.norm, 'use idf': tfidf.use_idf, 'sublinear tf': tfidf.sublinear_tf}
+		if tfidf.use_idf:
+			arrays[name + '_idf'] = numpy.asarray(tfidf.idf_, dtype=numpy.float64)
+	return feature
+
+
+def ExportLexicon(name, transformer, arrays):
+	# both lexicon columns, or one of them selected by ItemSelector
+	if isinstance(transformer, PipelineExtension.SentDictSparseFeature):
+		(lexicon, selected) = (transformer, [0, 1])
+	elif hasattr(transformer, 'steps') and len(transformer.steps) == 2 and isinstance(transformer.steps[0][1], PipelineExtension.SentDictOccurancesFeature) \
+			and isinstance(transformer.steps[1][1], PipelineExtension.ItemSelector) and transformer.steps[1][1].key in ('positive', 'negative'):
+		(lexicon, selected) = (transformer.steps[0][1], [0 if transformer.steps[1][1].key == 'positive' else 1])
+	else:
+		return None
+
+	# a word of both lexicons is positive
+	wordColumns = {}
+	for column, words in enumerate([lexicon.posDict, lexicon.negDict]):
+		for word in words:
+			wordColumns.setdefault(word, column)
+
+	(table, order) = StringTable(wordColumns.keys())
+	arrays[name + '_words'] = table
+	arrays[name + '_columns'] = numpy.array(wordColumns.values(), dtype=numpy.int64)[order]
+	return {'type': 'lexicon', 'selected columns': selected, 'columns': len(selected)}
+
+
+def ExportCompactModel(pipeline, directory, modelVersion):
+	steps = list(pipeline.steps)
+	manifest = {'format version': formatVersion, 'model version': modelVersion, 'rare words': None, 'features': []}
+	arrays = {}
+
+	if isinstance(steps[0][1], PipelineExtension.RareWordReplacer):
+		(table, order) = StringTable(steps[0][1].vocabulary_)
+		arrays['rare_words'] = table
+		manifest['rare words'] = {'substitute': steps[0][1].substString}
+		steps = steps[1:]
+
+	if len(steps) != 2 or not hasattr(steps[0][1], 'transformer_list') or not isinstance(steps[1][1], MultinomialNB):
+		raise ValueError('Only feature union and MultinomialNB pipelines are supported')
+
+	union = steps[0][1]
+	weights = union.transformer_weights or {}
+	for index, (name, transformer) in enumerate(union.transformer_list):
+		prefix = 'feature%d' % index
+		feature = ExportLexicon(prefix, transformer, arrays)
+		if feature is None:
+			feature = ExportVectorizer(prefix, transformer, arrays)
+		feature['name'] = name
+		feature['prefix'] = prefix
+		feature['weight'] = weights.get(name, 1.0)
+		manifest['features'].append(feature)
+
+	classifier = steps[1][1]
+	# labels are strings or rating numbers
+	manifest['classes'] = classifier.classes_.tolist()
+	arrays['feature_log_prob'] = numpy.asarray(classifier.feature_log_prob_, dtype=numpy.float64)
+	arrays['class_log_prior'] = numpy.asarray(classifier.class_log_prior_, dtype=numpy.float64)
+	if arrays['feature_log_prob'].shape[1] != sum(feature['columns'] for feature in manifest['features']):
+		raise ValueError('Number of features differs from classifier')
+
+	# written to a temporary directory first, so a loading server never sees a half written artifact
+	tempDirectory = directory + '.' + str(os.getpid()) + '.tmp'
+	if os.path.isdir(tempDirectory):
+		shutil.rmtree(tempDirectory)
+	os.makedirs(tempDirectory)
+	for name, values in arrays.items():
+		numpy.save(os.path.join(tempDirectory, name + '.npy'), values)
+	manifestfile = open(os.path.join(tempDirectory, manifestFileName), 'wb')
+	json.dump(manifest, manifestfile, indent=1, sort_keys=True)
+	manifestfile.close()
+
+	oldDirectory = directory + '.' + str(os.getpid()) + '.old'
+	if os.path.isdir(directory):
+		os.rename(directory, oldDirectory)
+	os.rename(tempDirectory, directory)
+	if os.path.isdir(oldDirectory):
+		shutil.rmtree(oldDirectory)
+
+
+def LoadCompactModel(directory, modelVersion=None):
+	# None if there is no artifact, or it was exported from an other model version or in an other format
+	manifestPath = os.path.join(directory, manifestFileName)
+	if not os.path.isfile(manifestPath):
+		return None
+	manifestfile = open(manifestPath, 'rb')
+	manifest = json.load(manifestfile)
+	manifestfile.close()
+	if manifest['format version'] != formatVersion or (modelVersion is not None and manifest['model version'] != modelVersion):
+		return None
+	return CompactModel(directory, manifest)
+
+
+class CompactModel(object):
+	""" Prediction from a compact model artifact, with the same output as predict_proba and predict
+	of the exported pipeline. Input documents are byte strings, as for the pipeline. """
+
+	def __init__(self, directory, manifest):
+		self.manifest = manifest
+		self.version = manifest['model version']
+		self.classes_ = numpy.array([str(label) if isinstance(label, unicode) else label for label in manifest['classes']])
+		self.arrays = {}
+		for fileName in os.listdir(directory):
+			if fileName.endswith('.npy'):
+				self.arrays[fileName[:-4]] = numpy.load(os.path.join(directory, fileName), mmap_mode='r')
+
+		self.rareWords = manifest['rare words']
+		# analyzers are built once, from the exported CountVectorizer parameters
+		self.analyzers = {}
+		for feature in manifest['features']:
+			if feature['type'] == 'count':
+				parameters = dict(feature['vectorizer'])
+				parameters['ngram_range'] = tuple(parameters['ngram_range'])
+				self.analyzers[feature['prefix']] = CountVectorizer(**parameters).build_analyzer()
+
+	def ReplaceRareWords(self, documents):
+		table = self.arrays['rare_words']
+		substString = str(self.rareWords['substitute'])
+		replaced = []
+		for document in documents:
+			words = document.split()
+			frequent = Lookup(table, words) >= 0
+			replaced.append(' '.join([word if known else substString for word, known in zip(words, frequent)]))
+		return replaced
+
+	def Columns(self, prefix, documentsWords):
+		# feature columns of words found in table of feature, and their offsets by document
+		table = self.arrays[prefix + '_words']
+		tableColumns = self.arrays[prefix + '_columns']
+		columns = []
+		offsets = [0]
+		for words in documentsWords:
+			positions = Lookup(table, words)
+			columns.append(tableColumns[positions[positions >= 0]])
+			offsets.append(offsets[-1] + len(columns[-1]))
+		columns = numpy.concatenate(columns) if len(columns) > 0 else numpy.zeros(0, dtype=numpy.int64)
+		return (columns, numpy.array(offsets, dtype=numpy.int64))
+
+	def Vectorize(self, feature, documents):
+		prefix = feature['prefix']
+		if feature['type'] == 'lexicon':
+			# dense positive and negative counts
+			(columns, offsets) = self.Columns(prefix, [document.split() for document in documents])
+			counts = numpy.zeros((len(documents), 2))
+			numpy.add.at(counts, (numpy.repeat(numpy.arange(len(documents)), numpy.diff(offsets)), columns), 1)
+			return counts[:, feature['selected columns']]
+
+		if feature['type'] == 'count':
+			analyzer = self.analyzers[prefix]
+			(columns, offsets) = self.Columns(prefix, [[word.encode('utf8') for word in analyzer(document)] for document in documents])
+		else:
+			(columns, offsets) = self.Columns(prefix, [document.split() for document in documents])
+		counts = csr_matrix((numpy.ones(len(columns)), columns, offsets), shape=(len(documents), feature['columns']))
+		counts.sum_duplicates()
+		if feature['type'] == 'count' and feature['vectorizer']['binary']:
+			counts.data.fill(1)
+
+		tfidf = feature.get('tfidf')
+		if tfidf is not None:
+			if tfidf['sublinear tf']:
+				numpy.log(counts.data, counts.data)
+				counts.data += 1
+			if tfidf['use idf']:
+				counts.data *= self.arrays[prefix + '_idf'][counts.indices]
+			if tfidf['norm'] is not None:
+				counts = normalize(counts, norm=tfidf['norm'], copy=False)
+		return counts
+
+	def JointLogLikelihood(self, documents):
+		# MultinomialNB on the feature union, every weighted feature block is multiplied by its own columns
+		if self.rareWords is not None:
+			documents = self.ReplaceRareWords(documents)
+		featureLogProb = self.arrays['feature_log_prob']
+		jointLikelihood = numpy.zeros((len(documents), len(self.classes_))) + self.arrays['class_log_prior']
+		start = 0
+		for feature in self.manifest['features']:
+			end = start + feature['columns']
+			jointLikelihood += (self.Vectorize(feature, documents) * feature['weight']).dot(featureLogProb[:, start:end].T)
+			start = end
+		return jointLikelihood
+
+	def predict_log_proba(self, documents):
+		jointLikelihood = self.JointLogLikelihood(documents)
+		return jointLikelihood - logsumexp(jointLikelihood, axis=1)[:, numpy.newaxis]
+
+	def predict_proba(self, documents):
+		return numpy.exp(self.predict_log_proba(documents))
+
+	def predict(self, documents):
+		return self.classes_[numpy.argmax(self.predict_log_proba(documents), axis=1)]
+
+
+def CompactModelPath(modelFilePath):
+	# directory of compact artifact next to pickled model: SentAnalysisModel.pkl -> SentAnalysisModel.compact
+	return os.path.splitext(modelFilePath)[0] + '.compact'
+
+
+def FileVersion(filePath):
+	# md5 of model file, as 'ModelVersion' of Application_functions.py
+	return hashlib.md5(open(filePath, 'rb').read()).hexdigest()
+
+
+def main(argv):
+	from sklearn.externals import joblib
+	import random
+
+	modelFilePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SentAnalysisModel.pkl')
+	directory = None
+	usage = 'Usage: python CompactModel.py [-m <model file>] [-o <compact model directory>]'
+	try:
+		(opts, args) = getopt.getopt(argv, 'hm:o:')
+	except getopt.GetoptError:
+		print usage
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt == '-h':
+			print usage
+			sys.exit()
+		elif opt == '-m':
+			modelFilePath = arg
+		elif opt == '-o':
+			directory = arg
+	if directory is None:
+		directory = CompactModelPath(modelFilePath)
+
+	pipeline = joblib.load(modelFilePath)
+	ExportCompactModel(pipeline, directory, FileVersion(modelFilePath))
+	model = LoadCompactModel(directory, FileVersion(modelFilePath))
+
+	# documents of random vocabulary and lexicon words, and some sentences
+	words = []
+	for name, values in model.arrays.items():
+		if name.endswith('_words'):
+			words.extend(values[:].tolist())
+	random.seed(0)
+	documents = ['ez egy nagyon rossz nap', 'hihetetlen boldog vagyok nagyon szuper', 'az alma angolul apple', '']
+	documents += [' '.join(random.sample(words, random.randint(1, 12))) for i in range(0, 1000)]
+
+	difference = numpy.abs(model.predict_proba(documents) - pipeline.predict_proba(documents)).max()
+	print 'Compact model is written to ' + directory
+	print 'Maximum difference of probabilities on ' + str(len(documents)) + ' documents: ' + repr(difference)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
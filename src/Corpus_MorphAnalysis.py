@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import sys, csv, getopt
+from multiprocessing import Pool, cpu_count
+from os.path import expanduser
+
+from NLPToolPool import Tokenize, ToolPool, HunPosTagger, OcamorphAnalyzer
+from Morphological_Disambiguation import MorphologicalDisambiguationLines
+
+""" Parallel version of MorphologicalAnalysis.sh for the training corpus.
+Preprocessed corpus is split into shards of consecutive rows, every shard is tokenized (huntoken),
+tagged (HunPos), analyzed (ocamorph) and disambiguated by one of N worker processes. Every worker
+keeps its own resident hunpos-tag and ocamorph process, results are merged in original order.
+
+Parameters:
+-input: input parameter for preprocessed sentiment corpus path
+-posfile: output parameter, determines a filepath to write part-of-speech tagging results
+-morphfile: output parameter, determines a filepath to write morhological analysis results
+-disambiguatedfile: optional output parameter, filepath of disambiguated results in SaveToFile format
+-workers: number of worker processes, default is number of cores
+
+Usage:
+python Corpus_MorphAnalysis.py -i <inputfile> -p <output_posfile> -m <output_morphfile> [-d <output_disambiguatedfile>] [-n <workers>]
+
+Example usage:
+python Corpus_MorphAnalysis.py -i $HOME/SentimentAnalysisHUN-master/tempfiles/OpinHuBank_20130106_posneg.csv -p $HOME/SentimentAnalysisHUN-master/tempfiles/hunpos_posneg.txt -m $HOME/SentimentAnalysisHUN-master/tempfiles/hunmorph_posneg.txt -n 4
+"""
+
+# Get home folder
+homeFolder = expanduser('~')
+
+# Necesseraly files for launching analysis tasks. They are predifened by installation.
+hunpostagFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/HunPos/hunpos-1.0-linux/hunpos-tag'
+szegedmodelFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/HunPos/hu_szeged_kr.model'
+ocamorphFilePath = homeFolder + '/SentimentAnalysisHUN-master/resources/HunMorph/morphdb.hu/morphdb_hu.bin'
+
+# number of rows in a shard, more shards than workers keep every worker busy until the end
+shardSize = 500
+
+# resident tools of a worker process, they are started at first shard of the process
+taggerPool = ToolPool(lambda: HunPosTagger(hunpostagFilePath, szegedmodelFilePath), 1)
+analyzerPool = ToolPool(lambda: OcamorphAnalyzer(ocamorphFilePath), 1)
+
+
+def ReadShards(corpusFilePath, shardSize):
+	# sentences are in the fifth column of preprocessed corpus, one row is one line for huntoken as in MorphologicalAnalysis.sh
+	corpusfile = open(corpusFilePath, 'rb')
+	csvreader = csv.reader(corpusfile, delimiter='\t')
+
+	shard = []
+	for row in csvreader:
+		shard.append(row[4].decode('latin2'))
+		if len(shard) == shardSize:
+			yield shard
+			shard = []
+	if len(shard) > 0:
+		yield shard
+
+	corpusfile.close()
+
+
+def AnalyzeShard(shard):
+	sentences = Tokenize('\n'.join(shard))
+
+	posLines = taggerPool.Run(sentences)
+	morphLines = analyzerPool.Run(sentences)
+	(wordsArray, disArray) = MorphologicalDisambiguationLines(posLines, morphLines)
+
+	return (posLines, morphLines, wordsArray, disArray)
+
+
+def CorpusMorphAnalysis(corpusFilePath, posFilePath, morphFilePath, disambiguatedFilePath=None, workers=None):
+	posfile = open(posFilePath, 'w')
+	morphfile = open(morphFilePath, 'w')
+	disfile = open(disambiguatedFilePath, 'w') if disambiguatedFilePath is not None else None
+
+	pool = Pool(workers or cpu_count())
+	try:
+		# imap gives back shards in original order, while workers run ahead
+		for (posLines, morphLines, wordsArray, disArray) in pool.imap(AnalyzeShard, ReadShards(corpusFilePath, shardSize)):
+			for line in posLines:
+				posfile.write(line + '\n')
+			for line in morphLines:
+				morphfile.write(line + '\n')
+			if disfile is not None:
+				for sentences in range(0, len(disArray)):
+					for words in range(0, len(disArray[sentences])):
+						disfile.write(wordsArray[sentences][words] + '\t' + disArray[sentences][words] + '\n')
+					disfile.write('\n')
+		pool.close()
+	except:
+		pool.terminate()
+		raise
+	finally:
+		pool.join()
+
+	posfile.close()
+	morphfile.close()
+	if disfile is not None:
+		disfile.close()
+
+
+def main():
+	usage = "Please use -i <inputfile> -p <output_posfile> -m <output_morphfile> [-d <output_disambiguatedfile>] [-n <workers>]"
+	try:
+		(opts, args) = getopt.getopt(sys.argv[1:], 'i:p:m:d:n:')
+	except getopt.GetoptError as error:
+		print str(error) + ' ' + usage
+		sys.exit(1)
+
+	options = dict(opts)
+	if not all(option in options for option in ['-i', '-p', '-m']):
+		print usage
+		sys.exit(1)
+
+	workers = int(options['-n']) if '-n' in options else None
+	CorpusMorphAnalysis(options['-i'], options['-p'], options['-m'], options.get('-d'), workers)
+
+if __name__ == '__main__':
+	main()
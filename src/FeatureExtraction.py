@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
-import os, sys, getopt, csv, nltk, numpy
+import os, sys, getopt, csv, logging, nltk, numpy
+from itertools import izip, tee
+
+logger = logging.getLogger('SentimentAnalysisHUN')
 
 
 
@@ -15,6 +18,9 @@ Variables:
 	
 Usage example:
 	n_gram(wordsArray, substArray, PreprocessedCorpusPath, 5, 1)
+
+Functions starting with 'iter_' are streaming versions, they process corpus line by line.
+'n_gram_intervals' gives back NumPy arrays of entity and window positions for the whole corpus.
 """
 
 def ReadCorpusIntoArray(PreprocessedCorpusPath):
@@ -23,6 +29,10 @@ def ReadCorpusIntoArray(PreprocessedCorpusPath):
 	return csvreader
 
 def n_gram_indexes_by_line(List, ListElement, EntityStart, EntityEnd, n_gram_number, n_gram_onoff):
+	return n_gram_window(len(List[ListElement]), EntityStart, EntityEnd, n_gram_number, n_gram_onoff)
+
+
+def n_gram_window(SentenceLength, EntityStart, EntityEnd, n_gram_number, n_gram_onoff):
 	if n_gram_onoff == 1:
 		# Determine +/- n-grams around entity
 		if (EntityStart - n_gram_number) < 0:
@@ -30,83 +40,118 @@ def n_gram_indexes_by_line(List, ListElement, EntityStart, EntityEnd, n_gram_num
 		else:
 			Start = EntityStart-n_gram_number
 
-		if (EntityEnd + n_gram_number) > len(List[ListElement]):		
-			End = len(List[ListElement])
+		if (EntityEnd + n_gram_number) > SentenceLength:		
+			End = SentenceLength
 		else:
 			End = EntityEnd + n_gram_number
 	else:
 		Start = 0
-		End = len(List[ListElement])
+		End = SentenceLength
 		
 	return (Start, End)
 
 
-def n_gram_intervals(wordsArray, PreprocessedCorpusPath, n_gram_number, n_gram_onoff):
-	corpusfile = ReadCorpusIntoArray(PreprocessedCorpusPath)
-	# Determine entity place in corpus - find word in a list
-	EntityStartList = []
-	EntityEndList = []
-	StartList = []
-	EndList = []
+def sentence_index(words):
+	# token -> first position in sentence, built once per sentence instead of repeated 'in' and 'index' scans
+	index = {}
+	for position, word in enumerate(words):
+		index.setdefault(word, position)
+	return index
 
-	iterator = 0
 
-	for line in corpusfile:	
+def entity_position_by_line(line, words, index=None):
 	# Determine EntityStart & End position, furthermore exceptions are needed to be handled. If exact match not exist, then a shortened form is searched.
-		if line[3].split()[0] in wordsArray[iterator]:
-			EntityStart = wordsArray[iterator].index(line[3].split()[0])
-			EntityStartList.append(EntityStart)
-			EntityEnd = EntityStart + int(line[2])
-			EntityEndList.append(EntityEnd)
+	if index is None:
+		index = sentence_index(words)
+	entityWord = line[3].split()[0]
+
+	if entityWord in index:
+		EntityStart = index[entityWord]
+	
+	else:
+		# first word containing the shortened form
+		shortened = entityWord[:-1]
+		EntityStart = next((position for position, word in enumerate(words) if shortened in word), None)
 		
-		elif any(line[3].split()[0][:-1] in s for s in wordsArray[iterator]):
-			matching_temp = [s for s in wordsArray[iterator] if line[3].split()[0][:-1] in s]
-			EntityStart = wordsArray[iterator].index(matching_temp[0])
-			EntityStartList.append(EntityStart)
-			EntityEnd = EntityStart + int(line[2])
-			EntityEndList.append(EntityEnd)
-			
-		elif str(line[3].split()[0]).lower() in wordsArray[iterator]:
+		if EntityStart is None:
 			# in case of capital letter would mean a problem
-			EntityStart = wordsArray[iterator].index(str(line[3].split()[0]).lower())
-			EntityStartList.append(EntityStart)
-			EntityEnd = EntityStart + int(line[2])
-			EntityEndList.append(EntityEnd)
-			
-		else:
-			print "Problem with entity match"
-			# TODO: logger setup
-	
+			EntityStart = index.get(str(entityWord).lower())
 		
-		(Start, End) = n_gram_indexes_by_line(wordsArray, iterator, EntityStart, EntityEnd, n_gram_number, n_gram_onoff)
-		StartList.append(Start)
-		EndList.append(End)
+		if EntityStart is None:
+			return None
+
+	EntityEnd = EntityStart + int(line[2])
+	return (EntityStart, EntityEnd)
+
+
+def iter_n_gram_intervals(wordsSentences, corpusRows, n_gram_number, n_gram_onoff):
+	# Streaming version of n_gram_intervals, gives back (EntityStart, EntityEnd, Start, End) line by line
+	EntityStart = 0
+	EntityEnd = 0
+
+	for words, line in izip(wordsSentences, corpusRows):
+		position = entity_position_by_line(line, words)
+		if position is None:
+			# previous entity position is kept
+			logger.warning("Entity not found in sentence, previous entity position is kept: " + repr(line[3]))
+		else:
+			(EntityStart, EntityEnd) = position
+
+		(Start, End) = n_gram_window(len(words), EntityStart, EntityEnd, n_gram_number, n_gram_onoff)
+		yield (EntityStart, EntityEnd, Start, End)
+
 
-		iterator += 1
+def n_gram_intervals(wordsArray, PreprocessedCorpusPath, n_gram_number, n_gram_onoff):
+	# Determine entity place in corpus, gives back NumPy arrays of EntityStart, EntityEnd, Start and End for the whole corpus
+	corpusfile = open(PreprocessedCorpusPath,'rb')
+	EntityStartList = []
+	EntityEndList = []
+	EntityStart = 0
+	EntityEnd = 0
+
+	for words, line in izip(wordsArray, csv.reader(corpusfile, delimiter='\t')):
+		position = entity_position_by_line(line, words)
+		if position is None:
+			# previous entity position is kept
+			logger.warning("Entity not found in sentence, previous entity position is kept: " + repr(line[3]))
+		else:
+			(EntityStart, EntityEnd) = position
+		EntityStartList.append(EntityStart)
+		EntityEndList.append(EntityEnd)
+	corpusfile.close()
+
+	EntityStarts = numpy.array(EntityStartList, dtype=numpy.int64)
+	EntityEnds = numpy.array(EntityEndList, dtype=numpy.int64)
+	SentenceLengths = numpy.array([len(words) for words in wordsArray[:len(EntityStartList)]], dtype=numpy.int64)
+
+	# same window as n_gram_window, computed for every sentence at once
+	if n_gram_onoff == 1:
+		Starts = numpy.maximum(EntityStarts - n_gram_number, 0)
+		Ends = numpy.minimum(EntityEnds + n_gram_number, SentenceLengths)
+	else:
+		Starts = numpy.zeros(len(SentenceLengths), dtype=numpy.int64)
+		Ends = SentenceLengths
 	
-	return (EntityStartList, EntityEndList, StartList, EndList)
+	return (EntityStarts, EntityEnds, Starts, Ends)
 	
 
+def iter_n_gram(wordsAndSentences, corpusRows, n_gram_number, n_gram_onoff):
+	# Streaming version of n_gram, input is an iterable of (original words, sentence to n-gram) pairs
+	(wordsPairs, sentencePairs) = tee(wordsAndSentences)
+	intervals = iter_n_gram_intervals((words for (words, line) in wordsPairs), corpusRows, n_gram_number, n_gram_onoff)
+
+	# Filter out Entity from SpanInterval, in order not to be in training set
+	for (words, line), (EntityStart, EntityEnd, Start, End) in izip(sentencePairs, intervals):
+		yield line[Start:EntityStart] + line[EntityEnd:End]
+
+
 def n_gram(wordsArray, Array_to_N_Gram, PreprocessedCorpusPath, n_gram_number, n_gram_onoff):
 	# Leave it so, it is needed for Span Interval determination
-	(EntityStartList, EntityEndList, StartList, EndList) = n_gram_intervals(wordsArray, PreprocessedCorpusPath, n_gram_number, n_gram_onoff)
-	
-	# Filter out Entity from SpanInterval, in order not to be in training set
-	n_gram_Array = []
-	
-	iterator = 0
-	for line in Array_to_N_Gram:
-		elements = []
-	
-		for element in line[StartList[iterator]:EntityStartList[iterator]]:
-			elements.append(element)
-		for element in line[EntityEndList[iterator]:EndList[iterator]]:
-			elements.append(element)
-			
-		n_gram_Array.append(elements)
-		iterator += 1
+	(EntityStarts, EntityEnds, Starts, Ends) = n_gram_intervals(wordsArray, PreprocessedCorpusPath, n_gram_number, n_gram_onoff)
 
-	return n_gram_Array
+	# Filter out Entity from SpanInterval, in order not to be in training set
+	return [line[Start:EntityStart] + line[EntityEnd:End] for line, EntityStart, EntityEnd, Start, End
+		in izip(Array_to_N_Gram, EntityStarts.tolist(), EntityEnds.tolist(), Starts.tolist(), Ends.tolist())]
 
 
 # FUNCTION FOR WORD EXTRACTION TO HAVE A LIST OF POSSIBLE WORDS
@@ -121,28 +166,19 @@ def get_words_from_array(sentencesArray):
 # FEATURE TO SUBSTITUTE RARE TOKENS/WORDS WITH A SPECIAL STRING 
 """ Rare tokens are really a huge problem for machine learning tasks, so they 
 are substituted with a unique token. Now applying this function machine learning 
-results are going to be more realistic. """
+results are going to be more realistic. 
+For training and prediction use 'PipelineExtension.RareWordReplacer' in the sklearn pipeline,
+which learns frequent words at fit time and applies them identically at prediction time. """
 def replace_if_occurances(sentencesArray, wordlist, occurance_threshold, substString):
 	words_with_occurances = nltk.FreqDist(wordlist)
-	words = words_with_occurances.keys()
-	occurances = words_with_occurances.values()
-
-	# Determine words to substitute with a new _rare_ string
-	wordsToReplace = []
-	for i in range(0, len(occurances)):
-		if occurances[i] < occurance_threshold:
-			wordsToReplace.append(words[i])	
+
+	# Determine words to substitute with a new _rare_ string, set is used for constant time lookup
+	wordsToReplace = set(word for word, occurance in words_with_occurances.iteritems() if occurance < occurance_threshold)
 	
 	# Create new array with _rare_ values	
 	substArray = []
 	for sentence in sentencesArray:
-		substSentence = [] 
-		for word in sentence:
-			if word not in wordsToReplace:
-				substSentence.append(word)
-			else:
-				substSentence.append(substString)			 			
-		substArray.append(substSentence)
+		substArray.append([substString if word in wordsToReplace else word for word in sentence])
 		
 	return substArray
 
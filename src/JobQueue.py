@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import os, re, json, time, uuid, threading, logging
+from Queue import Queue, Full
+
+""" Bounded queue of background jobs with a fixed number of worker threads.
+Long inputs are processed here instead of in request threads, so they do not block short requests.
+If queue is full, Submit raises JobQueueFull instead of accepting more work.
+
+Status and result of every job is kept in a JSON file of 'resultDir', so with several server
+worker processes any of them can answer status requests. Files older than 'timeToLive' are removed.
+Worker threads are started lazily in the process which submits jobs, as in NLPToolPool.ToolPool.
+
+Job states: queued, running, done (with 'results'), failed (with 'error').
+
+Usage example:
+	jobQueue = JobQueue(1, 100, '/var/tmp/jobs', 3600)
+	jobId = jobQueue.Submit(function, (argument,))
+	jobQueue.Status(jobId)		# {'job id': ..., 'status': 'done', 'results': ...}
+"""
+
+logger = logging.getLogger('SentimentAnalysisHUN')
+
+# job ids are hex strings, other ids are never used as file names
+jobIdPattern = re.compile('^[0-9a-f]{32}$')
+# seconds between removals of old job files
+cleanupInterval = 60
+
+
+class JobQueueFull(Exception):
+	pass
+
+
+class JobQueue(object):
+
+	def __init__(self, workers, maxSize, resultDir, timeToLive):
+		self.workers = workers
+		self.maxSize = maxSize
+		self.resultDir = resultDir
+		self.timeToLive = timeToLive
+		self.pid = None
+		self.lock = threading.Lock()
+		self.queue = None
+		self.lastCleanup = 0
+
+	def Initialize(self):
+		with self.lock:
+			if self.pid == os.getpid():
+				return
+			if not os.path.isdir(self.resultDir):
+				os.makedirs(self.resultDir)
+			self.queue = Queue(self.maxSize)
+			for i in range(0, self.workers):
+				worker = threading.Thread(target=self.Worker)
+				worker.daemon = True
+				worker.start()
+			self.pid = os.getpid()
+
+	def Submit(self, function, args):
+		self.Initialize()
+		jobId = uuid.uuid4().hex
+		self.Write(jobId, {'status': 'queued'})
+		try:
+			self.queue.put_nowait((jobId, function, args))
+		except Full:
+			os.remove(self.FilePath(jobId))
+			raise JobQueueFull('Job queue is full')
+		return jobId
+
+	def Status(self, jobId):
+		if not jobIdPattern.match(jobId):
+			return None
+		try:
+			jobfile = open(self.FilePath(jobId), 'rb')
+		except IOError:
+			return None
+		status = json.load(jobfile)
+		jobfile.close()
+		return status
+
+	def Size(self):
+		return self.queue.qsize() if self.queue is not None else 0
+
+	def Worker(self):
+		while True:
+			(jobId, function, args) = self.queue.get()
+			self.Write(jobId, {'status': 'running'})
+			try:
+				self.Write(jobId, {'status': 'done', 'results': function(*args)})
+			except Exception as error:
+				logger.exception("Job_exception")
+				self.Write(jobId, {'status': 'failed', 'error': str(error)})
+			self.Cleanup()
+
+	def FilePath(self, jobId):
+		return os.path.join(self.resultDir, jobId + '.json')
+
+	def Write(self, jobId, status):
+		status['job id'] = jobId
+		# temporary file is renamed, so a status request never reads a half written file
+		tempPath = self.FilePath(jobId) + '.' + str(os.getpid()) + '.tmp'
+		jobfile = open(tempPath, 'wb')
+		json.dump(status, jobfile)
+		jobfile.close()
+		os.rename(tempPath, self.FilePath(jobId))
+
+	def Cleanup(self):
+		now = time.time()
+		if now - self.lastCleanup < cleanupInterval:
+			return
+		self.lastCleanup = now
+		for fileName in os.listdir(self.resultDir):
+			filePath = os.path.join(self.resultDir, fileName)
+			try:
+				if os.path.getmtime(filePath) < now - self.timeToLive:
+					os.remove(filePath)
+			except OSError:
+				# removed by an other process in the meantime
+				pass
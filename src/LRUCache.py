@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import os, time, threading, cPickle
+from collections import OrderedDict
+
+""" Bounded, thread-safe least recently used cache.
+When maximum size is reached, least recently used element is dropped. With timeToLive (seconds)
+elements expire after the given time as well. It counts hits and misses for monitoring and is able
+to save its content to disk and load it back at next start.
+
+Usage example:
+	cache = LRUCache(10000, '/var/tmp/cache.pkl')
+	cache.Put('ablakot', ['ablak/NOUN<CAS<ACC>>'])
+	cache.Get('ablakot')
+"""
+
+class LRUCache(object):
+
+	def __init__(self, maxSize, persistPath=None, timeToLive=None):
+		self.maxSize = maxSize
+		self.persistPath = persistPath
+		self.timeToLive = timeToLive
+		self.items = OrderedDict()
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		# content differs from persist file
+		self.modified = False
+
+		if persistPath is not None and os.path.isfile(persistPath):
+			try:
+				self.Load(persistPath)
+			except Exception:
+				# unreadable cache file is ignored, cache is rebuilt from scratch
+				self.Clear()
+			self.modified = False
+
+	def Get(self, key, default=None):
+		with self.lock:
+			if key in self.items:
+				# move element to the end, it is the most recently used one
+				(value, expiry) = self.items.pop(key)
+				if expiry is None or expiry > time.time():
+					self.items[key] = (value, expiry)
+					self.hits += 1
+					return value
+			self.misses += 1
+			return default
+
+	def Put(self, key, value, expiry=None):
+		if expiry is None and self.timeToLive is not None:
+			expiry = time.time() + self.timeToLive
+		with self.lock:
+			if key in self.items:
+				self.items.pop(key)
+			self.items[key] = (value, expiry)
+			self.modified = True
+			while len(self.items) > self.maxSize:
+				self.items.popitem(last=False)
+
+	def __len__(self):
+		return len(self.items)
+
+	def Clear(self):
+		with self.lock:
+			self.items.clear()
+
+	def Stats(self):
+		with self.lock:
+			return {
+				'size': len(self.items),
+				'max size': self.maxSize,
+				'time to live': self.timeToLive,
+				'hits': self.hits,
+				'misses': self.misses,
+			}
+
+	def Save(self, filePath=None):
+		filePath = filePath or self.persistPath
+		with self.lock:
+			items = self.items.items()
+
+		# write temporary file first, so a crash never leaves a half written cache behind
+		tempPath = filePath + '.' + str(os.getpid()) + '.tmp'
+		outfile = open(tempPath, 'wb')
+		cPickle.dump(items, outfile, cPickle.HIGHEST_PROTOCOL)
+		outfile.close()
+		os.rename(tempPath, filePath)
+		self.modified = False
+
+	def Load(self, filePath=None):
+		filePath = filePath or self.persistPath
+		infile = open(filePath, 'rb')
+		items = cPickle.load(infile)
+		infile.close()
+
+		# elements are saved from least to most recently used, expired ones are skipped
+		now = time.time()
+		for key, (value, expiry) in items[-self.maxSize:]:
+			if expiry is None or expiry > now:
+				self.Put(key, value, expiry)
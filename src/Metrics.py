@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+import os, glob, json, time, atexit, threading, logging
+from contextlib import contextmanager
+
+""" Latency histograms of processing stages and requests, in Prometheus text format.
+Every stage (e.g. tokenize, hunpos, ocamorph) is measured with 'Timed', durations are counted in
+cumulative buckets per stage. With 'StartTimings' durations of current request are collected as well,
+e.g. to attach them to a debug response.
+Metrics are kept per process. With 'EnableMultiprocess' (production server with several workers) every
+process writes its histograms and counters ('statsFunction', e.g. cache hits) to its own file in a shared
+directory in background, and 'PrometheusText' and 'Stats' sum the files of all processes, so counters are
+monotonic whichever worker answers a scrape. Files of stopped workers are kept (their counts are not lost),
+directory is emptied when multiprocess mode is enabled at server start.
+
+Usage example:
+	with Timed('tokenize'):
+		sentences = Tokenize(inputString)
+	PrometheusText()
+"""
+
+stageMetric = 'sentimentanalysis_stage_duration_seconds'
+requestMetric = 'sentimentanalysis_request_duration_seconds'
+metricDescriptions = {
+	stageMetric: 'Duration of processing stages in seconds',
+	requestMetric: 'Duration of HTTP requests in seconds',
+}
+# upper bounds of buckets in seconds
+buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# histograms keyed by (metric name, label name, label value)
+histograms = {}
+histogramsLock = threading.Lock()
+# durations of current request by thread
+requestTimings = threading.local()
+
+# directory shared by server worker processes, None keeps metrics per process (see 'EnableMultiprocess')
+multiprocessDir = None
+# seconds between writes of metrics file of a process
+flushInterval = 1.0
+# function giving counters of current process as a (nested) dictionary, they are summed over processes by 'Stats'
+statsFunction = None
+# configuration values in counters, they are not summed
+configurationStats = ('max size', 'time to live')
+flusherPid = None
+flusherLock = threading.Lock()
+flusherStopped = threading.Event()
+
+logger = logging.getLogger('SentimentAnalysisHUN')
+
+
+class Histogram(object):
+
+	def __init__(self, buckets):
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.sum = 0.0
+		self.count = 0
+		self.lock = threading.Lock()
+
+	def Observe(self, value):
+		with self.lock:
+			for i, bound in enumerate(self.buckets):
+				if value <= bound:
+					self.counts[i] += 1
+					break
+			self.sum += value
+			self.count += 1
+
+	def Snapshot(self):
+		# cumulative counts of buckets, sum and count
+		with self.lock:
+			cumulative = []
+			total = 0
+			for count in self.counts:
+				total += count
+				cumulative.append(total)
+			return (cumulative, self.sum, self.count)
+
+
+def Observe(metricName, labelName, labelValue, seconds):
+	if multiprocessDir is not None and flusherPid != os.getpid():
+		StartFlusher()
+	key = (metricName, labelName, labelValue)
+	histogram = histograms.get(key)
+	if histogram is None:
+		with histogramsLock:
+			histogram = histograms.setdefault(key, Histogram(buckets))
+	histogram.Observe(seconds)
+
+
+def StartTimings():
+	requestTimings.timings = []
+
+
+def StopTimings():
+	timings = getattr(requestTimings, 'timings', None)
+	requestTimings.timings = None
+	return timings
+
+
+def Record(stage, seconds, timings):
+	Observe(stageMetric, 'stage', stage, seconds)
+	if timings is not None:
+		timings.append({'stage': stage, 'seconds': seconds})
+
+
+@contextmanager
+def Timed(stage):
+	timings = getattr(requestTimings, 'timings', None)
+	start = time.time()
+	try:
+		yield
+	finally:
+		Record(stage, time.time() - start, timings)
+
+
+def TimedFunction(stage, function):
+	# function measured in an other thread, e.g. with RunInParallel, is recorded to timings of calling thread
+	timings = getattr(requestTimings, 'timings', None)
+
+	def Wrapper(*args):
+		start = time.time()
+		try:
+			return function(*args)
+		finally:
+			Record(stage, time.time() - start, timings)
+
+	return Wrapper
+
+
+def EnableMultiprocess(directory):
+	# called before workers are forked, metrics files of a previous run are removed
+	global multiprocessDir
+	if not os.path.isdir(directory):
+		os.makedirs(directory)
+	for filePath in glob.glob(os.path.join(directory, 'metrics_*.json')):
+		os.remove(filePath)
+	multiprocessDir = directory
+
+
+def ProcessMetrics():
+	# histograms and counters of current process in JSON format
+	with histogramsLock:
+		items = histograms.items()
+	return {
+		'histograms': [[name, labelName, labelValue] + list(histogram.Snapshot()) for (name, labelName, labelValue), histogram in items],
+		'stats': statsFunction() if statsFunction is not None else {},
+	}
+
+
+def Flush():
+	# written to a temporary file first, so an other process never reads a half written file
+	filePath = os.path.join(multiprocessDir, 'metrics_' + str(os.getpid()) + '.json')
+	tempFilePath = filePath + '.tmp'
+	with open(tempFilePath, 'w') as metricsFile:
+		json.dump(ProcessMetrics(), metricsFile)
+	os.rename(tempFilePath, filePath)
+
+
+def StartFlusher():
+	# started lazily in the process which observes, so a process forked after import has its own one
+	global flusherPid
+	with flusherLock:
+		if flusherPid == os.getpid():
+			return
+		flusherPid = os.getpid()
+	flusher = threading.Thread(target=Flusher, args=(flusherStopped,))
+	flusher.daemon = True
+	flusher.start()
+
+
+def Flusher(stopped):
+	# stopped at exit, before globals of modules are cleared
+	while not stopped.wait(flushInterval):
+		try:
+			Flush()
+		except Exception:
+			logger.exception("Metrics_flush_exception")
+
+def FlushAtExit():
+	# last counts of a stopping worker are written as well
+	flusherStopped.set()
+	if multiprocessDir is not None and flusherPid == os.getpid():
+		try:
+			Flush()
+		except (IOError, OSError):
+			pass
+
+atexit.register(FlushAtExit)
+
+
+def CollectMetrics():
+	# metrics of every process in multiprocess mode (current one is written first), otherwise of current process
+	if multiprocessDir is None:
+		return [ProcessMetrics()]
+
+	Flush()
+	processes = []
+	for filePath in glob.glob(os.path.join(multiprocessDir, 'metrics_*.json')):
+		try:
+			with open(filePath) as metricsFile:
+				processes.append(json.load(metricsFile))
+		except (IOError, ValueError):
+			logger.exception("Metrics_read_exception")
+	return processes
+
+
+def SumStats(statsList):
+	# numbers are summed, configuration values and other types are taken from first process
+	total = {}
+	for stats in statsList:
+		for key, value in stats.items():
+			if key not in total:
+				total[key] = SumStats([value]) if isinstance(value, dict) else value
+			elif isinstance(value, dict):
+				total[key] = SumStats([total[key], value])
+			elif isinstance(value, (int, long, float)) and key not in configurationStats:
+				total[key] += value
+	return total
+
+
+def Stats():
+	processes = CollectMetrics()
+	stats = SumStats([process['stats'] for process in processes])
+	stats['processes'] = len(processes)
+	return stats
+
+
+def PrometheusText():
+	# histograms of same metric and label are summed over processes
+	merged = {}
+	for process in CollectMetrics():
+		for (name, labelName, labelValue, cumulative, total, count) in process['histograms']:
+			key = (name, labelName, labelValue)
+			if key in merged:
+				(mergedCumulative, mergedTotal, mergedCount) = merged[key]
+				merged[key] = ([a + b for a, b in zip(mergedCumulative, cumulative)], mergedTotal + total, mergedCount + count)
+			else:
+				merged[key] = (cumulative, total, count)
+	items = sorted(merged.items())
+
+	lines = []
+	for metricName in sorted(metricDescriptions):
+		lines.append('# HELP ' + metricName + ' ' + metricDescriptions[metricName])
+		lines.append('# TYPE ' + metricName + ' histogram')
+		for (name, labelName, labelValue), (cumulative, total, count) in items:
+			if name != metricName:
+				continue
+			label = labelName + '="' + labelValue.replace('\\', '\\\\').replace('"', '\\"') + '"'
+			for bound, bucketCount in zip(buckets, cumulative):
+				lines.append('%s_bucket{%s,le="%s"} %d' % (metricName, label, repr(bound), bucketCount))
+			lines.append('%s_bucket{%s,le="+Inf"} %d' % (metricName, label, count))
+			lines.append('%s_sum{%s} %r' % (metricName, label, total))
+			lines.append('%s_count{%s} %d' % (metricName, label, count))
+
+	return '\n'.join(lines) + '\n'
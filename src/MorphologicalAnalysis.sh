@@ -13,6 +13,8 @@ Usage:
 Example usage:
 ./MorphologicalAnalysis.sh -i $HOME/SentimentAnalysisHUN-master/tempfiles/OpinHuBank_20130106_posneg.csv -p $HOME/SentimentAnalysisHUN-master/tempfiles/hunpos_posneg.txt -m $HOME/SentimentAnalysisHUN-master/tempfiles/hunmorph_posneg.txt
 
+Corpus_MorphAnalysis.py does the same with several worker processes, with the same parameters and -n <workers>.
+
 COMMENT
 
 
@@ -7,47 +7,99 @@ import tempfile, csv
 Functions:
 - MorphologicalDisambiguation: can decide from PoS and morph results the proper morphologically analyzed form of each tokens.
 	As input it takes pos and morph file, and gives a list as output.
+- MorphologicalDisambiguationLines: same as MorphologicalDisambiguation, but it takes iterables of HunPos and HunMorph
+	output lines (lists, generators or opened streams), so no intermediate file is needed.
+- IterMorphologicalDisambiguation: streaming version of MorphologicalDisambiguationLines, yields one sentence at a time.
 - StemmedForm: can truncate morphological disambiguated form to use only its base form (stemmed form).
+- IterStemmedForm: streaming version of StemmedForm.
 - SaveToFile: is only for test purposes, to save results to external file.
 """
 
 def MorphologicalDisambiguation(posfilePath, morphfilePath):
+	posfile = open(posfilePath, 'r')
+	morphfile = open(morphfilePath, 'r')
+
+	(wordsArray, disambiguatedArray) = MorphologicalDisambiguationLines(posfile, morphfile)
+
+	# Close files
+	posfile.close()
+	morphfile.close()
+
+	return (wordsArray, disambiguatedArray)
+
+
+def MorphologicalDisambiguationLines(posLines, morphLines):
 	
 	# HunPos outputs read into an array	
+	wordsArray = []
 	posArray = []
+	for (wordsList, posList) in IterPosSentences(posLines):
+		wordsArray.append(wordsList)
+		posArray.append(posList)
+
+	# HunMorph options read in a multidimensinal array
+	morphArray = list(IterMorphSentences(morphLines))
+	
+	# Disambiguation
+	disambiguatedArray = []	
+
+	if len(posArray) == len(morphArray):
+		for sentIter in range(0, len(morphArray)):
+			disambiguatedArray.append(DisambiguateSentence(wordsArray[sentIter], posArray[sentIter], morphArray[sentIter]))
+	
+	else:
+		# TODO: logger
+		print "error"
+
+	return (wordsArray, disambiguatedArray)
+
+
+def IterMorphologicalDisambiguation(posLines, morphLines):
+	# Streaming version, gives back (words, disambiguated) sentence by sentence, so whole corpus is never in memory
+	morphSentences = IterMorphSentences(morphLines)
+	for (wordsList, posList) in IterPosSentences(posLines):
+		morphSentList = next(morphSentences, None)
+		if morphSentList is None:
+			raise ValueError('HunMorph output has less sentences than HunPos output')
+		yield (wordsList, DisambiguateSentence(wordsList, posList, morphSentList))
+
+	if next(morphSentences, None) is not None:
+		raise ValueError('HunMorph output has more sentences than HunPos output')
+
+
+def IterPosSentences(posLines):
+	# HunPos outputs read sentence by sentence
 	posList = []
-	wordsArray = []
 	wordsList = []
 	
-	posfile = open(posfilePath, 'r')
-	posfilecsv = csv.reader(posfile, delimiter='\t')
+	posfilecsv = csv.reader(posLines, delimiter='\t')
 	
 	for line in posfilecsv:
 		# Filter empty rows with this feature
 		if len(line) > 0:
 			if 'thisistheending' in line[0]:
-				wordsArray.append(wordsList)
-				posArray.append(posList)
+				yield (wordsList, posList)
 				wordsList = []
 				posList = []
 			else:
 				wordsList.append(line[0])
 				posList.append(line[1])
 
-	# HunMorph options read in a multidimensinal array
-	morphfile = open(morphfilePath, 'r')
-	
-	morphArray = []
+
+def IterMorphSentences(morphLines):
+	# HunMorph options read sentence by sentence, every word has a list of options
 	morphSentList = []
 	morphWordList = []
 	
 	# To skip sentence ending 'thisistheending' morph analysis
 	sentenceEndFlag = 0
 
-	for line in morphfile:
+	for line in morphLines:
 		if 'thisistheending' in line:
-			morphSentList.append(morphWordList)
-			morphArray.append(morphSentList)
+			# sentence without any word has no analysis either
+			if len(morphWordList) > 0:
+				morphSentList.append(morphWordList)
+			yield morphSentList
 			morphSentList = []
 			morphWordList = []
 			sentenceEndFlag = 1
@@ -62,52 +114,39 @@ def MorphologicalDisambiguation(posfilePath, morphfilePath):
 				morphWordList = []
 			else:
 				morphWordList.append(line.replace('\n',''))
-	
-	# Disambiguation
-	disambiguatedArray = []	
 
-	if len(posArray) == len(morphArray):
-		for sentIter in range(0, len(morphArray)):
-			disambiguatedSentence = []
-			for wordIter in range(0, len(morphArray[sentIter])):
-				# HunMorph has only one suggestion and it is not UNKNOWN
-				if len(morphArray[sentIter][wordIter]) == 1 and morphArray[sentIter][wordIter][0] != 'UNKNOWN':
-					disambiguatedSentence.append(morphArray[sentIter][wordIter][0])
-				# Observe matching elements. If there is any then choose first one from HunMorph.
-				else:
-					matching = [s for s in morphArray[sentIter][wordIter] if posArray[sentIter][wordIter] in s]
-					if len(matching) == 0:
-						disambiguatedSentence.append(wordsArray[sentIter][wordIter])				
-					else:
-						disambiguatedSentence.append(matching[0])
-			
-			disambiguatedArray.append(disambiguatedSentence)
-	
-	else:
-		# TODO: logger
-		print "error"
 
-	# Close files
-	posfile.close()
-	morphfile.close()
-	
-	return (wordsArray, disambiguatedArray)
+def DisambiguateSentence(wordsList, posList, morphSentList):
+	disambiguatedSentence = []
+	for wordIter in range(0, len(morphSentList)):
+		# HunMorph has only one suggestion and it is not UNKNOWN
+		if len(morphSentList[wordIter]) == 1 and morphSentList[wordIter][0] != 'UNKNOWN':
+			disambiguatedSentence.append(morphSentList[wordIter][0])
+		# Observe matching elements. If there is any then choose first one from HunMorph.
+		else:
+			matching = [s for s in morphSentList[wordIter] if posList[wordIter] in s]
+			if len(matching) == 0:
+				disambiguatedSentence.append(wordsList[wordIter])				
+			else:
+				disambiguatedSentence.append(matching[0])
+
+	return disambiguatedSentence
 
 
 # WithPOS to append POS to stemmed form with option "1" 
 def StemmedForm(disambiguatedArray, withPOS):
-	stemmedArray = []
-	
-	for sentence in disambiguatedArray:
+	return list(IterStemmedForm(disambiguatedArray, withPOS))
+
+
+def IterStemmedForm(disambiguatedSentences, withPOS):
+	for sentence in disambiguatedSentences:
 		stemmedSentence = []
 		for word in sentence:
 			if withPOS == 0:
 				stemmedSentence.append(word.split('/')[0])
 			else:
 				stemmedSentence.append(word.split('<')[0])
-		stemmedArray.append(stemmedSentence)		 
-	
-	return stemmedArray
+		yield stemmedSentence
 
 
 def SaveToFile(wordsArray, disambigutedArray, outputFilePath):
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+import os, sys, time, select, subprocess, threading, logging
+from Queue import Queue
+from contextlib import contextmanager
+from distutils.spawn import find_executable
+
+from xmlparser import ParseLines
+from Tokenizer import ToLatin2
+
+""" This python file keeps the external NLP tools (HunPos, ocamorph) resident in memory.
+Loading the Szeged model and the morphdb binary takes far more time than tagging a sentence,
+so these processes are started once and fed through pipes for every request.
+Classes and functions:
+- Tokenize: runs huntoken once on input text and gives back a list of tokenized sentences.
+- TokenizeBatch: runs huntoken once on several documents and gives back tokenized sentences by document.
+- ResidentTool: base class of a long-lived external process with restart-on-crash, read timeout and periodic health check.
+  A tool which does not answer through a pipe at start (block buffered output) is started for every request instead.
+- HunPosTagger: resident 'hunpos-tag', gives back lines in same format as hunpos-tag writes them to a file.
+- OcamorphAnalyzer: resident 'ocamorph --bin', gives back lines in same format as ocamorph writes them to a file.
+- ToolPool: fixed size pool of resident tools, one tool is used by only one request at a time.
+- CachedAnalyzerPool: ocamorph pool in front of an LRU cache, only unseen words are sent to ocamorph.
+- RunInParallel: runs functions in separate threads, e.g. HunPos and ocamorph on the same token stream.
+"""
+
+logger = logging.getLogger('SentimentAnalysisHUN')
+
+# sentence closure token, same as xmlparser.py emits it
+sentenceEnding = 'thisistheending'
+# paragraph put between documents at batch tokenization
+documentEnding = 'thisisthedocumentending'
+# word used for health check of resident tools, taken from install.sh
+healthCheckWord = 'ablakot'
+# seconds to wait for next output line of a resident tool, after that it is hung and restarted
+readTimeout = 60
+healthCheckTimeout = 10
+# seconds between health checks of an idle tool, checked when it is acquired
+healthCheckInterval = 60
+# seconds to wait for the first answer of a started tool (it loads its model first)
+probeTimeout = 30
+# C stdio of tools is line buffered with stdbuf (if it is installed), tools with own buffering are probed at start
+lineBufferCommand = ['stdbuf', '-oL'] if find_executable('stdbuf') else []
+
+
+class ToolTimeout(Exception):
+	pass
+
+
+def Tokenize(inputString, huntokenCommand='huntoken'):
+	# tokenize input text with a single huntoken call, no shell is involved
+	p = subprocess.Popen([huntokenCommand], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	(xml_out, err) = p.communicate(ToLatin2(inputString).encode('latin2') + '\n')
+
+	sentences = []
+	sentence = []
+	for token in ParseLines(xml_out.splitlines(True)):
+		if token == sentenceEnding:
+			sentences.append(sentence)
+			sentence = []
+		else:
+			sentence.append(token)
+
+	return sentences
+
+
+def TokenizeBatch(inputStrings, huntokenCommand='huntoken'):
+	# every document is a separate paragraph, followed by a paragraph of 'thisisthedocumentending'
+	paragraphs = []
+	for inputString in inputStrings:
+		paragraphs.append(' '.join(ToLatin2(inputString).split()).encode('latin2'))
+		paragraphs.append(documentEnding)
+
+	p = subprocess.Popen([huntokenCommand], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	(xml_out, err) = p.communicate('\n\n'.join(paragraphs) + '\n')
+
+	documents = []
+	sentences = []
+	sentence = []
+	for token in ParseLines(xml_out.splitlines(True)):
+		if token == sentenceEnding:
+			if len(sentence) > 0:
+				sentences.append(sentence)
+			sentence = []
+		elif token == documentEnding:
+			# closure of document even if huntoken joined it to the last sentence
+			if len(sentence) > 0:
+				sentences.append(sentence)
+			documents.append(sentences)
+			sentences = []
+			sentence = []
+		else:
+			sentence.append(token)
+
+	if len(documents) != len(inputStrings):
+		raise ValueError('huntoken output contains ' + str(len(documents)) + ' documents instead of ' + str(len(inputStrings)))
+
+	return documents
+
+
+def RunInParallel(tasks):
+	# tasks are (function, arguments) tuples, results are given back in same order
+	results = [None] * len(tasks)
+	errors = []
+
+	def Worker(index, function, args):
+		try:
+			results[index] = function(*args)
+		except Exception:
+			errors.append(sys.exc_info())
+
+	threads = [threading.Thread(target=Worker, args=(index, function, args)) for index, (function, args) in enumerate(tasks)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	# re-raise first failure with its original traceback
+	if len(errors) > 0:
+		raise errors[0][0], errors[0][1], errors[0][2]
+
+	return results
+
+
+def SentenceLines(sentences):
+	# flatten sentences into tool input lines with 'thisistheending' at every sentence closure
+	lines = []
+	for sentence in sentences:
+		lines.extend(sentence)
+		lines.append(sentenceEnding)
+	return lines
+
+
+class ResidentTool(object):
+	""" Long-lived external process, which reads its input from stdin and writes results to stdout.
+	Subclasses define how many lines belong to the answer of a request with 'ReadResponse'. """
+
+	def __init__(self, command):
+		self.command = command
+		self.process = None
+		# complete lines read from stdout but not yet used, and the incomplete last line
+		self.pendingLines = []
+		self.partialLine = ''
+		self.timeout = readTimeout
+		# False if tool is started for every request, see 'Probe'
+		self.resident = True
+		self.checkedAt = 0
+
+	def Start(self):
+		devnull = open(os.devnull, 'w')
+		self.process = subprocess.Popen(lineBufferCommand + self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull)
+		devnull.close()
+		self.pendingLines = []
+		self.partialLine = ''
+		self.checkedAt = time.time()
+
+	def Stop(self):
+		if self.process is not None:
+			try:
+				self.process.kill()
+				self.process.wait()
+			except OSError:
+				pass
+		self.process = None
+
+	def Restart(self):
+		logger.warning("Restarting resident tool: " + ' '.join(self.command))
+		self.Stop()
+		self.Start()
+
+	def IsAlive(self):
+		return self.process is not None and self.process.poll() is None
+
+	def HealthCheck(self, timeout=None):
+		# tool is healthy if it is running and answers to a simple word in time
+		self.checkedAt = time.time()
+		try:
+			return self.IsAlive() and len(self.Communicate([[healthCheckWord]], timeout or healthCheckTimeout)) > 0
+		except Exception:
+			return False
+
+	def Probe(self):
+		# a tool which does not flush its output line by line answers only when its buffer is full,
+		# so every request would wait for 'readTimeout', it is started for every request instead
+		if self.HealthCheck(probeTimeout):
+			return True
+		logger.error(' '.join(self.command) + ' did not answer through a pipe in ' + str(probeTimeout) + ' seconds (block buffered output?), it is started for every request')
+		self.Stop()
+		self.resident = False
+		return False
+
+	def Run(self, sentences):
+		# tools answer nothing to empty input, so they are not asked at all
+		if len(sentences) == 0:
+			return []
+		if not self.resident:
+			return self.RunOnce(sentences)
+
+		# restart tool if it is crashed, and try once more if tool dies during the request
+		if not self.IsAlive():
+			self.Restart()
+		try:
+			return self.Communicate(sentences)
+		except ToolTimeout:
+			# same input would hang again, so it is not retried
+			logger.exception("Resident_tool_timeout")
+			self.Restart()
+			raise
+		except (IOError, OSError, EOFError):
+			logger.exception("Resident_tool_exception")
+			self.Restart()
+			return self.Communicate(sentences)
+
+	def RunOnce(self, sentences):
+		# tool writes its whole output at exit, when its input is closed
+		devnull = open(os.devnull, 'w')
+		process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull)
+		devnull.close()
+		timer = threading.Timer(readTimeout, process.kill)
+		timer.start()
+		try:
+			(output, err) = process.communicate(''.join(line + '\n' for line in self.InputLines(sentences)))
+		finally:
+			timer.cancel()
+
+		self.pendingLines = list(reversed(output.split('\n')))
+		self.partialLine = ''
+		return self.ReadResponse(sentences)
+
+	def Communicate(self, sentences, timeout=None):
+		lines = self.InputLines(sentences)
+		self.timeout = timeout if timeout is not None else readTimeout
+
+		# input is written in a separate thread, tools start to answer before whole input is consumed
+		writer = threading.Thread(target=self.Write, args=(lines,))
+		writer.daemon = True
+		writer.start()
+		response = self.ReadResponse(sentences)
+		writer.join()
+
+		return response
+
+	def Write(self, lines):
+		try:
+			self.process.stdin.write(''.join(line + '\n' for line in lines))
+			self.process.stdin.flush()
+		except IOError:
+			pass
+
+	def ReadLine(self):
+		# stdout is read in blocks without Python's file buffer, so select sees every unread output
+		deadline = time.time() + self.timeout
+		while len(self.pendingLines) == 0:
+			if self.process is None:
+				raise EOFError(' '.join(self.command) + ' gave back incomplete output')
+			remaining = deadline - time.time()
+			if remaining <= 0 or len(select.select([self.process.stdout], [], [], remaining)[0]) == 0:
+				raise ToolTimeout(' '.join(self.command) + ' did not answer in ' + str(self.timeout) + ' seconds')
+			block = os.read(self.process.stdout.fileno(), 65536)
+			if block == '':
+				raise EOFError(' '.join(self.command) + ' terminated unexpectedly')
+			lines = (self.partialLine + block).split('\n')
+			self.partialLine = lines.pop()
+			self.pendingLines.extend(reversed(lines))
+		return self.pendingLines.pop()
+
+	def InputLines(self, sentences):
+		return SentenceLines(sentences)
+
+	def ReadResponse(self, sentences):
+		raise NotImplementedError
+
+
+class HunPosTagger(ResidentTool):
+	""" hunpos-tag tags input until an empty line, and closes its output with an empty line as well. """
+
+	def __init__(self, hunpostagFilePath, szegedmodelFilePath):
+		ResidentTool.__init__(self, [hunpostagFilePath, szegedmodelFilePath])
+
+	def InputLines(self, sentences):
+		return SentenceLines(sentences) + ['']
+
+	def ReadResponse(self, sentences):
+		lines = []
+		line = self.ReadLine()
+		while line != '':
+			lines.append(line)
+			line = self.ReadLine()
+		return lines
+
+
+class OcamorphAnalyzer(ResidentTool):
+	""" ocamorph writes a '> word' line and its analyses for every input word.
+	Response is over after the analysis of the last 'thisistheending'. """
+
+	def __init__(self, ocamorphFilePath):
+		ResidentTool.__init__(self, ['ocamorph', '--bin', ocamorphFilePath])
+
+	def ReadResponse(self, sentences):
+		lines = []
+		endings = 0
+		while endings < len(sentences):
+			line = self.ReadLine()
+			lines.append(line)
+			if line.startswith('> ') and sentenceEnding in line:
+				endings += 1
+		# analysis line of last 'thisistheending'
+		lines.append(self.ReadLine())
+		return lines
+
+
+class ToolPool(object):
+	""" Fixed size pool of resident tools. Tools are started lazily in the process which uses them,
+	so a pool created before a fork never shares pipes between processes. """
+
+	def __init__(self, factory, size):
+		self.factory = factory
+		self.size = size
+		self.pid = None
+		self.lock = threading.Lock()
+		self.tools = []
+		self.idle = None
+
+	def Initialize(self):
+		with self.lock:
+			if self.pid == os.getpid():
+				return
+			self.tools = [self.factory() for i in range(0, self.size)]
+			self.idle = Queue()
+			for tool in self.tools:
+				tool.Start()
+				tool.Probe()
+				self.idle.put(tool)
+			self.pid = os.getpid()
+
+	@contextmanager
+	def Acquire(self):
+		self.Initialize()
+		tool = self.idle.get()
+		try:
+			# crashed tools are restarted, hung ones are found by a health check from time to time
+			if not tool.resident:
+				pass
+			elif not tool.IsAlive():
+				tool.Restart()
+			elif time.time() - tool.checkedAt > healthCheckInterval and not tool.HealthCheck():
+				tool.Restart()
+			yield tool
+		finally:
+			self.idle.put(tool)
+
+	def Run(self, sentences):
+		if len(sentences) == 0:
+			return []
+		with self.Acquire() as tool:
+			return tool.Run(sentences)
+
+	def Shutdown(self):
+		with self.lock:
+			for tool in self.tools:
+				tool.Stop()
+			self.tools = []
+			self.pid = None
+
+
+class CachedAnalyzerPool(object):
+	""" Pool of ocamorph analyzers with an LRU cache of analyses keyed by word.
+	It gives back exactly the same lines as OcamorphAnalyzer, so MorphologicalDisambiguation is unchanged.
+	Sentence closure 'thisistheending' is cached like any other word. """
+
+	def __init__(self, analyzerPool, cache):
+		self.analyzerPool = analyzerPool
+		self.cache = cache
+
+	def Run(self, sentences):
+		analyses = {}
+		unseenWords = []
+		for word in SentenceLines(sentences):
+			if word in analyses:
+				continue
+			analysis = self.cache.Get(word)
+			if analysis is None:
+				unseenWords.append(word)
+			analyses[word] = analysis
+
+		# analyze every unseen word with one ocamorph call
+		if len(unseenWords) > 0:
+			for word, analysis in zip(unseenWords, self.Analyze(unseenWords)):
+				analyses[word] = analysis
+				self.cache.Put(word, analysis)
+
+		lines = []
+		for word in SentenceLines(sentences):
+			lines.append('> ' + word)
+			lines.extend(analyses[word])
+		return lines
+
+	def Analyze(self, words):
+		# words are sent as one sentence, analyses of closure word are dropped
+		lines = self.analyzerPool.Run([[word for word in words if word != sentenceEnding]])
+
+		wordAnalyses = []
+		for line in lines:
+			if line.startswith('> '):
+				wordAnalyses.append([])
+			elif len(wordAnalyses) > 0:
+				wordAnalyses[-1].append(line)
+
+		closureAnalysis = wordAnalyses.pop()
+		analyses = iter(wordAnalyses)
+		return [closureAnalysis if word == sentenceEnding else next(analyses) for word in words]
+
+	def Shutdown(self):
+		self.analyzerPool.Shutdown()
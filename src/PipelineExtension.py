@@ -1,13 +1,30 @@
 # Import libs
-from numpy import array, recarray
+from collections import Counter
+from numpy import array, recarray, ones, unique, bincount, flatnonzero, where, int32, int64
+from scipy.sparse import csr_matrix
 
 # Import sklearn base classes
 from sklearn.base import BaseEstimator, TransformerMixin
 
+# Import token id representation
+from Vocabulary import EncodedSentences, Encoded
+
 
 # FEATURES FOR SKLEARN.PIPELINE EXTENSION
 """ There are some classes which are especially dedicated to
-sklearn.pipeline's toolkit extension. """
+sklearn.pipeline's toolkit extension. 
+Transformers working on words accept token ids ('Vocabulary.EncodedSentences') as well as strings. """
+
+def CountMatrix(sentences, columns, columnNumber, dtype=int):
+	# sparse sentence x column count matrix, 'columns' gives the column of every vocabulary id (-1 is skipped)
+	# empty tokens are skipped, as splitting a joined sentence drops them
+	emptyId = sentences.vocabulary.Lookup('')
+	if emptyId >= 0:
+		columns[emptyId] = -1
+	tokenColumns = columns[sentences.ids]
+	known = tokenColumns >= 0
+	return csr_matrix((ones(known.sum(), dtype=dtype), (sentences.RowIndices()[known], tokenColumns[known])), shape=(len(sentences), columnNumber))
+
  
 class SentDictOccurancesFeature(BaseEstimator, TransformerMixin):
 	""" This feature is used at next phase - "sklearn pipeline" - 
@@ -41,6 +58,99 @@ class SentDictOccurancesFeature(BaseEstimator, TransformerMixin):
 		return PosNegOccurances
 
 
+class SentDictSparseFeature(BaseEstimator, TransformerMixin):
+	""" Faster replacement of 'SentDictOccurancesFeature' + 'ItemSelector' pair.
+	At fit time lexicon words get an index and a sparse indicator matrix with a
+	positive and a negative column. At transform time every document becomes a row
+	of word indexes, and one sparse matrix product gives back both counts.
+	A word in both lexicons is counted as positive, as in 'SentDictOccurancesFeature'.
+	"""
+
+	def __init__(self, posDict='', negDict=''):
+		self.posDict = posDict
+		self.negDict = negDict
+
+	def fit(self, raw_documents=None, y=None):
+		self.vocabulary_ = {}
+		columns = []
+		for column, lexicon in enumerate([self.posDict, self.negDict]):
+			for word in lexicon:
+				if word not in self.vocabulary_:
+					self.vocabulary_[word] = len(columns)
+					columns.append(column)
+
+		rows = range(0, len(columns))
+		self.lexiconMatrix_ = csr_matrix((ones(len(columns), dtype=int), (rows, columns)), shape=(len(columns), 2))
+		return self
+
+	def transform(self, raw_documents, y=None):
+		sentences = Encoded(raw_documents)
+		occurances = CountMatrix(sentences, sentences.vocabulary.IdMap(self.vocabulary_), len(self.vocabulary_))
+
+		# positive and negative occurances in two columns
+		return (occurances * self.lexiconMatrix_).toarray()
+
+
+class RareWordReplacer(BaseEstimator, TransformerMixin):
+	""" RareWordReplacer substitutes rare words with a special string as first step of
+	"sklearn pipeline". Words occuring less than 'occurance_threshold' times in the training
+	documents are rare. Frequent words are learned at fit time and saved together with the model,
+	so the same substitution is applied at prediction time (unseen words are rare as well).
+	Counting and substitution are linear in number of words.
+	"""
+
+	def __init__(self, occurance_threshold=3, substString='_rare_'):
+		self.occurance_threshold = occurance_threshold
+		self.substString = substString
+
+	def fit(self, raw_documents, y=None):
+		if isinstance(raw_documents, EncodedSentences):
+			words = raw_documents.vocabulary.words
+			occurances = bincount(raw_documents.ids, minlength=len(words))
+			self.vocabulary_ = frozenset(words[wordId] for wordId in flatnonzero(occurances >= self.occurance_threshold) if words[wordId] != '')
+			return self
+
+		occurances = Counter(word for sentence in raw_documents for word in sentence.split())
+		self.vocabulary_ = frozenset(word for word, occurance in occurances.iteritems() if occurance >= self.occurance_threshold)
+		return self
+
+	def transform(self, raw_documents, y=None):
+		if isinstance(raw_documents, EncodedSentences):
+			# rare ids are replaced by id of 'substString' in the same vocabulary
+			# empty tokens are kept, they are not words
+			frequent = raw_documents.vocabulary.IdMask(self.vocabulary_.union(['']))
+			substId = raw_documents.vocabulary.Id(self.substString)
+			ids = where(frequent[raw_documents.ids], raw_documents.ids, substId).astype(int32)
+			return EncodedSentences(ids, raw_documents.offsets, raw_documents.vocabulary)
+
+		vocabulary = self.vocabulary_
+		substString = self.substString
+		return [' '.join([word if word in vocabulary else substString for word in sentence.split()]) for sentence in raw_documents]
+
+
+class TokenIdVectorizer(BaseEstimator, TransformerMixin):
+	""" Word count vectorizer of token ids ('Vocabulary.EncodedSentences'), a replacement of CountVectorizer
+	for already tokenized sentences: they are not joined into strings to be split again. Tokens are used as
+	they are (no lowercasing, no token pattern, empty tokens are skipped). Columns are the words of training set in sorted order, and
+	'vocabulary_' is a word -> column dictionary, as CountVectorizer has. Strings are split at whitespace,
+	so a trained pipeline predicts on text as well.
+	"""
+
+	def fit(self, raw_documents, y=None):
+		self.fit_transform(raw_documents)
+		return self
+
+	def fit_transform(self, raw_documents, y=None):
+		sentences = Encoded(raw_documents)
+		words = sorted(sentences.vocabulary.words[wordId] for wordId in unique(sentences.ids) if sentences.vocabulary.words[wordId] != '')
+		self.vocabulary_ = dict((word, column) for column, word in enumerate(words))
+		return self.transform(sentences)
+
+	def transform(self, raw_documents, y=None):
+		sentences = Encoded(raw_documents)
+		return CountMatrix(sentences, sentences.vocabulary.IdMap(self.vocabulary_), len(self.vocabulary_), int64)
+
+
 class ItemSelector(BaseEstimator, TransformerMixin):
 	""" Itemselector is used at next phase at "sklearn pipeline". Its main role is
 	to select positive or negative occurances in a tuple coming from
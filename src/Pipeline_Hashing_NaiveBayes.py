@@ -0,0 +1,45 @@
+# Import sklearn functions
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.pipeline import Pipeline, FeatureUnion
+from sklearn.naive_bayes import MultinomialNB
+
+# Import pipeline extension
+import PipelineExtension
+
+def pipeline_Hashing_NaiveBayes(posLexicon, negLexicon):
+	# create sklearn.pipeline for out-of-core machine learning, every step can be used without seeing whole corpus
+	pipeline = Pipeline([
+		
+	    # Feature extraction part
+	    ('features', FeatureUnion(
+			transformer_list=[
+
+			    # Hashing needs no vocabulary, so it can vectorize corpus chunk by chunk
+			    ('hashing', HashingVectorizer(encoding='latin2', n_features=2**20, alternate_sign=False)),
+
+			    # Positive and negative sentiment dictionary occurances as a feature, both columns at once
+			    ('sentdic', PipelineExtension.SentDictSparseFeature(posDict=posLexicon, negDict=negLexicon)),
+
+			],
+
+			# weight components in FeatureUnion
+			transformer_weights={
+			    'hashing': 1.0,
+			    'sentdic': 0.5,
+			},
+	    	)),
+	   # Naive Bayes classifier, trained with partial_fit
+	   ('classifier', MultinomialNB()),
+
+	])
+
+
+	return pipeline
+
+def getparams_Hashing_NaiveBayes():
+	# parameters of out-of-core training, there is no gridsearch on chunks
+	params = {
+	    'classifier__alpha': 1.0,
+	}
+
+	return params
@@ -9,54 +9,66 @@ from sklearn.pipeline import Pipeline, FeatureUnion
 import PipelineExtension
 
 
-def pipeline_PCA_Regression(posLexicon, negLexicon):
+def pipeline_PCA_Regression(posLexicon, negLexicon, sparse=False, tokenIds=False, memory=None):
+	# tokenIds=True vectorizes 'Vocabulary.EncodedSentences' token ids directly instead of strings
+	# memory (directory or joblib.Memory) caches fitted transformer steps, so parameter search refits them only if their input or parameters change
+	vectorizer = PipelineExtension.TokenIdVectorizer() if tokenIds else CountVectorizer(encoding='latin2')
+
+	# sparse=True reduces dimension with TruncatedSVD directly on sparse CountVectorizer output, no dense copy of corpus is needed
+	if sparse:
+		reduction = Pipeline([
+			('countVec', vectorizer),
+			('svd', TruncatedSVD(n_components=2)),			# LSA on CSR matrix
+		])
+	else:
+		reduction = Pipeline([
+			('countVec', vectorizer),
+			('densify', PipelineExtension.Densifier()),		# densifier to apply toarray() transformation
+			('pca', PCA(n_components=2)),					# this is called otherwise LSA, n_components need to have same number as input label category number
+		])
+
 	# create sklearn.pipeline for automated machine learning
 	pipeline = Pipeline([
 		
+	    # Rare words are substituted with '_rare_', frequent words are learned from training set
+	    ('rare', PipelineExtension.RareWordReplacer(occurance_threshold=3, substString='_rare_')),
+
 	    # Feature extraction part
 	    ('features', FeatureUnion(
 			transformer_list=[
 
-			    # Dimension reduction with pca
-			    ('pca', Pipeline([
-					('countVec', CountVectorizer(encoding='latin2')),					
-					('densify', PipelineExtension.Densifier()),		# densifier to apply toarray() transformation
-					('pca', PCA(n_components=2)),			# this is called otherwise LSA, n_components need to have same number as input label category number
-			    ])),
-
-			    # Positive and negative sentiment dictionary occurances as a feature
-			    ('sentdic_positive', Pipeline([
-					('sentDicOcc', PipelineExtension.SentDictOccurancesFeature(posDict=posLexicon, negDict=negLexicon)),
-					('posOcc', PipelineExtension.ItemSelector(key='positive'))
-			    ])),
-			    ('sentdic_negative', Pipeline([
-					('sentDicOcc', PipelineExtension.SentDictOccurancesFeature(posDict=posLexicon, negDict=negLexicon)),
-					('negOcc', PipelineExtension.ItemSelector(key='negative'))
-			    ])),
+			    # Dimension reduction with pca or truncated svd
+			    ('pca', reduction),
+
+			    # Positive and negative sentiment dictionary occurances as a feature, both columns at once
+			    ('sentdic', PipelineExtension.SentDictSparseFeature(posDict=posLexicon, negDict=negLexicon)),
 
 			],
 
 			# weight components in FeatureUnion
 			transformer_weights={
 			    'pca': 1.0,
-			    'sentdic_positive': 0.5,
-			    'sentdic_negative': 0.5,
+			    'sentdic': 0.5,
 			},
 	    	)),
 
 	   # Regression
 	   ('regression', LogisticRegression()),
 
-	])
+	], memory=memory)
 
 
 	return pipeline
 
-def getparams_PCA_Regression():
+def getparams_PCA_Regression(tuning=False):
 	# use gridsearchCV for automated machine learning with multiple options - "parameters"
 	params = {
 	    'regression__solver': ['liblinear'],
 	}
 
+	# wider grid for 'Classifier.tune_pipelines', default training keeps a single candidate
+	if tuning:
+		params['regression__C'] = [0.1, 1.0, 10.0]
+
 	return params
 
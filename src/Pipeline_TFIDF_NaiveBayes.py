@@ -9,48 +9,47 @@ from sklearn.naive_bayes import MultinomialNB
 # Import pipeline extension
 import PipelineExtension
 
-def pipeline_TFIDF_NaiveBayes(posLexicon, negLexicon):
+def pipeline_TFIDF_NaiveBayes(posLexicon, negLexicon, tokenIds=False, memory=None):
+	# tokenIds=True vectorizes 'Vocabulary.EncodedSentences' token ids directly instead of strings
+	# memory (directory or joblib.Memory) caches fitted transformer steps, so parameter search refits them only if their input or parameters change
+	vectorizer = PipelineExtension.TokenIdVectorizer() if tokenIds else CountVectorizer(encoding='latin2')
+
 	# create sklearn.pipeline for automated machine learning
 	pipeline = Pipeline([
 		
+	    # Rare words are substituted with '_rare_', frequent words are learned from training set
+	    ('rare', PipelineExtension.RareWordReplacer(occurance_threshold=3, substString='_rare_')),
+
 	    # Feature extraction part
 	    ('features', FeatureUnion(
 			transformer_list=[
 
 			    # TF-IDF to have a more accurate overview on words, which have a huge influance on sentiment analysis
 			    ('tfidf', Pipeline([
-					('basic_cv', CountVectorizer(encoding='latin2')),
+					('basic_cv', vectorizer),
 					('tfidf_trans', TfidfTransformer()),
 			    ])),
 
-			    # Positive and negative sentiment dictionary occurances as a feature
-			    ('sentdic_positive', Pipeline([
-					('sentDicOcc', PipelineExtension.SentDictOccurancesFeature(posDict=posLexicon, negDict=negLexicon)),
-					('posOcc', PipelineExtension.ItemSelector(key='positive'))
-			    ])),
-			    ('sentdic_negative', Pipeline([
-					('sentDicOcc', PipelineExtension.SentDictOccurancesFeature(posDict=posLexicon, negDict=negLexicon)),
-					('negOcc', PipelineExtension.ItemSelector(key='negative'))
-			    ])),
+			    # Positive and negative sentiment dictionary occurances as a feature, both columns at once
+			    ('sentdic', PipelineExtension.SentDictSparseFeature(posDict=posLexicon, negDict=negLexicon)),
 
 			],
 
 			# weight components in FeatureUnion
 			transformer_weights={
 			    'tfidf': 1.0,
-			    'sentdic_positive': 0.5,
-			    'sentdic_negative': 0.5,
+			    'sentdic': 0.5,
 			},
 	    	)),
 	   # Naive Bayes classifier
 	   ('classifier', MultinomialNB()),
 
-	])
+	], memory=memory)
 
 
 	return pipeline
 
-def getparams_TFIDF_NaiveBayes():
+def getparams_TFIDF_NaiveBayes(tuning=False):
 	# use gridsearchCV for automated machine learning with multiple options - "parameters"
 	params = {
 	    'classifier__alpha': [1.0], 		#[0.5, 0.75, 1.0, 1.25, 1.5],
@@ -58,5 +57,9 @@ def getparams_TFIDF_NaiveBayes():
 	    'classifier__fit_prior': [True],
 	}
 
+	# wider grid for 'Classifier.tune_pipelines', default training keeps a single candidate
+	if tuning:
+		params['classifier__alpha'] = [0.5, 0.75, 1.0, 1.25, 1.5]
+
 	return params
 
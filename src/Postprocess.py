@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
-import os, sys, getopt, csv
-from polyglot.text import Text
+import os, sys, getopt, csv, re
 from itertools import chain
 
 """ This python file contains functions for postprocessing phase of morphological and PoS analyzed data.
@@ -9,41 +8,78 @@ Functions:
 - NumberFilter: uses a very light filtering of number characters out from input list. 
 - NER_Dictionary: is a function for creating 3 Named Entity Recognition dictionaries (location, names, organizations) as return lists.
 - NERFilter: uses dictionaries mainly created by NER_Dictionary to filter entities from input list.
+- SentenceFilter: fused stopword, number and NER filter. Dictionaries are loaded once into frozensets and
+	every sentence is filtered in one pass. It is used at training and for online requests as well.
 """
 
-def StopWordFilter(sentencesArray, stopwordsFilePath):
-	stopwords = []
-	stopfile = open(stopwordsFilePath,'rb')
-	for line in stopfile:
-    		if not line.strip().startswith("#"):
-        		stopwords.append(line.rstrip().decode('utf8'))
-
-	filteredArray = []
-	for sentence in sentencesArray:
-		filteredSentence = []
-		for word in sentence:
-			# Decode word to unicode to be capable of doing comparison with same encoding
-			if word.decode('latin2') not in stopwords:
-				filteredSentence.append(word)
-		filteredArray.append(filteredSentence)
-		
-	return filteredArray
+# Stopwords already read from file, by file path
+stopwordsByFilePath = {}
 
+def ReadStopwords(stopwordsFilePath):
+	# Stopwords are encoded to latin2 once, which is the encoding of analyzed words.
+	# A stopword which can not be encoded would never match a latin2 word anyway.
+	if stopwordsFilePath not in stopwordsByFilePath:
+		stopwords = set()
+		stopfile = open(stopwordsFilePath,'rb')
+		for line in stopfile:
+			if not line.strip().startswith("#"):
+				try:
+					stopwords.add(line.rstrip().decode('utf8').encode('latin2'))
+				except UnicodeError:
+					pass
+		stopfile.close()
+		stopwordsByFilePath[stopwordsFilePath] = frozenset(stopwords)
 
-def NumberFilter(sentencesArray):
-	filteredArray = []
-	for sentence in sentencesArray:
-		filteredSentence = []
+	return stopwordsByFilePath[stopwordsFilePath]
+
+
+class SentenceFilter(object):
+	""" Stopword, number and entity filtering in a single pass over each sentence.
+	Every option is optional:
+		- stopwordsFilePath: stopword lexicon file
+		- filterNumbers: drop words containing any digit
+		- entityLists: lists of entities (e.g. from NER_Dictionary) to drop
+
+	Usage example:
+		sentenceFilter = SentenceFilter(stopwordsFilePath)
+		filteredArray = list(sentenceFilter.Filter(sentencesArray))
+	"""
+
+	digits = re.compile('[0-9]')
+
+	def __init__(self, stopwordsFilePath=None, filterNumbers=True, entityLists=()):
+		words = set()
+		if stopwordsFilePath is not None:
+			words.update(ReadStopwords(stopwordsFilePath))
+		for entityList in entityLists:
+			words.update(entityList)
+		self.words = frozenset(words)
+		self.filterNumbers = filterNumbers
+
+	def FilterSentence(self, sentence):
+		words = self.words
+		containsDigit = self.digits.search if self.filterNumbers else None
 		for word in sentence:
-			characters = set('0123456789')
-			if not any((c in characters) for c in word):
-				filteredSentence.append(word)
-		filteredArray.append(filteredSentence)
+			if word not in words and not (containsDigit and containsDigit(word)):
+				yield word
 
-	return filteredArray
+	def Filter(self, sentencesArray):
+		for sentence in sentencesArray:
+			yield list(self.FilterSentence(sentence))
+
+
+def StopWordFilter(sentencesArray, stopwordsFilePath):
+	return list(SentenceFilter(stopwordsFilePath, filterNumbers=False).Filter(sentencesArray))
+
+
+def NumberFilter(sentencesArray):
+	return list(SentenceFilter().Filter(sentencesArray))
 
 # This function creates 3 dictionaries for location, person and organization. Important, every result set is in UNICODE encoding! 
 def NER_Dictionary(CorpusFilePath):
+	# Polyglot is imported only here, as other filters do not need it
+	from polyglot.text import Text
+
 	corpusfile = open(CorpusFilePath, 'rb')
 	csvreader = csv.reader(corpusfile, delimiter='\t')
 
@@ -83,14 +119,5 @@ def NER_Dictionary(CorpusFilePath):
 	return (locationList, personList, organizationList)
 
 def NERfilter(sentencesArray, filterList):
-	filteredArray = []
-	for sentence in sentencesArray:
-		filteredSentence = []
-		for word in sentence:
-			if word not in filterList:			
-				filteredSentence.append(word)
-			
-		filteredArray.append(filteredSentence)
-
-	return filteredArray
+	return list(SentenceFilter(filterNumbers=False, entityLists=[filterList]).Filter(sentencesArray))
 
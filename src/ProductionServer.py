@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from gunicorn.app.base import BaseApplication
+
+""" Production server mode of the REST API with gunicorn (http://gunicorn.org/).
+Flask's own server runs in a single process, this one runs several pre-forked worker processes,
+each of them with several threads.
+
+Application (machine learning model, caches and Polyglot NER if preloaded) is loaded once in master
+process before forking workers (preload_app), so workers share its memory copy-on-write.
+Resident NLP tools are started by every worker at its first request.
+Changed model file is reloaded by every worker in background (see Application_functions.ReloadModel),
+workers are not restarted for it.
+
+Usage example:
+	RunServer(app, '0.0.0.0', 5000, workers=4, threads=2)
+"""
+
+class ProductionServer(BaseApplication):
+
+	def __init__(self, application, options):
+		self.application = application
+		self.options = options
+		BaseApplication.__init__(self)
+
+	def load_config(self):
+		for key, value in self.options.items():
+			if key in self.cfg.settings and value is not None:
+				self.cfg.set(key, value)
+
+	def load(self):
+		return self.application
+
+
+def ServerOptions(host, port, workers, threads):
+	return {
+		'bind': host + ':' + str(port),
+		'workers': workers,
+		'threads': threads,
+		# threaded workers need 'futures' package on Python 2
+		'worker_class': 'gthread' if threads > 1 else 'sync',
+		'preload_app': True,
+		# first request of a worker starts HunPos and ocamorph
+		'timeout': 120,
+		# requests in progress are finished at shutdown or restart of workers
+		'graceful_timeout': 60,
+	}
+
+
+def RunServer(application, host, port, workers, threads):
+	ProductionServer(application, ServerOptions(host, port, workers, threads)).run()
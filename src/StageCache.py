@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import os, shutil, hashlib, tempfile
+import numpy
+
+from Vocabulary import Vocabulary, EncodedSentences
+
+""" On-disk cache of preprocessing stages between training runs.
+Every stage result is stored under a key, which is a hash of stage name, its parameters,
+content of its input files and key of previous stage. If nothing changed, stage is loaded
+from disk instead of being recomputed, if anything changed, key is different.
+
+Stage results are lists of tokenized sentences (e.g. words and disambiguated forms), stored in
+a compact binary format: a vocabulary file and for every sentence list a NumPy array of
+token ids plus an array of sentence offsets (see Vocabulary.py). Arrays are memory-mapped at load,
+and with 'encoded' they are given back as EncodedSentences without decoding them to strings.
+
+Keys do not depend on stage results, so every key can be determined first and only the last
+cached stage needs to be loaded.
+
+Usage example:
+	cache = StageCache(cacheDir)
+	disKey = cache.Key('disambiguation', None, {}, [posfilePath, morphfilePath])
+	stemKey = cache.Key('stemmed', disKey, {'withPOS': 0}, [])
+	disambiguation = lambda: cache.Get(disKey, lambda: MorphologicalDisambiguation(posfilePath, morphfilePath))
+	(stemmedArray,) = cache.Get(stemKey, lambda: (StemmedForm(disambiguation()[1], 0),))
+"""
+
+# change it if storage format changes, old cache entries are not used anymore
+formatVersion = '1'
+
+
+def FileHash(filePath):
+	# content hash of a file, read in blocks
+	digest = hashlib.sha1()
+	infile = open(filePath, 'rb')
+	block = infile.read(1 << 20)
+	while block:
+		digest.update(block)
+		block = infile.read(1 << 20)
+	infile.close()
+	return digest.hexdigest()
+
+
+class StageCache(object):
+
+	def __init__(self, cacheDir):
+		self.cacheDir = cacheDir
+		self.fileHashes = {}
+		self.results = {}
+		if not os.path.isdir(cacheDir):
+			os.makedirs(cacheDir)
+
+	def FileHash(self, filePath):
+		# file hashes are reused while file is unchanged
+		stat = os.stat(filePath)
+		signature = (filePath, stat.st_size, stat.st_mtime)
+		if signature not in self.fileHashes:
+			self.fileHashes[signature] = FileHash(filePath)
+		return self.fileHashes[signature]
+
+	def Key(self, stageName, parentKey, params, files):
+		digest = hashlib.sha1()
+		digest.update(formatVersion + '\n' + stageName + '\n' + str(parentKey) + '\n')
+		digest.update(repr(sorted(params.items())) + '\n')
+		for filePath in files:
+			digest.update(self.FileHash(filePath) + '\n')
+		return stageName + '-' + digest.hexdigest()
+
+	def Get(self, key, compute, encoded=False):
+		# give back result of a stage, result is computed and saved only if it is not cached yet
+		if (key, encoded) not in self.results:
+			computed = None
+			result = self.Load(key)
+			if result is None:
+				computed = compute()
+				result = self.Save(key, computed)
+			if not encoded:
+				result = computed if computed is not None else tuple(sentences.Decode() for sentences in result)
+			self.results[(key, encoded)] = result
+		return self.results[(key, encoded)]
+
+	def Load(self, key):
+		stageDir = os.path.join(self.cacheDir, key)
+		if not os.path.isdir(stageDir):
+			return None
+
+		vocabulary = Vocabulary.Load(os.path.join(stageDir, 'vocabulary.txt'))
+
+		result = []
+		arrayNumber = int(open(os.path.join(stageDir, 'arrays.txt')).read())
+		for i in range(0, arrayNumber):
+			ids = numpy.load(os.path.join(stageDir, str(i) + '.ids.npy'), mmap_mode='r')
+			offsets = numpy.load(os.path.join(stageDir, str(i) + '.offsets.npy'), mmap_mode='r')
+			result.append(EncodedSentences(ids, offsets, vocabulary))
+
+		return tuple(result)
+
+	def Save(self, key, result):
+		# one vocabulary for every sentence list of a stage
+		vocabulary = Vocabulary()
+		encodedResult = tuple(EncodedSentences.FromSentences(sentencesArray, vocabulary) for sentencesArray in result)
+
+		# stage is written to a temporary directory first, so a half written stage is never loaded
+		tempDir = tempfile.mkdtemp(dir=self.cacheDir)
+		vocabulary.Save(os.path.join(tempDir, 'vocabulary.txt'))
+
+		for i, sentences in enumerate(encodedResult):
+			numpy.save(os.path.join(tempDir, str(i) + '.ids.npy'), sentences.ids)
+			numpy.save(os.path.join(tempDir, str(i) + '.offsets.npy'), sentences.offsets)
+		open(os.path.join(tempDir, 'arrays.txt'), 'w').write(str(len(encodedResult)))
+
+		try:
+			os.rename(tempDir, os.path.join(self.cacheDir, key))
+		except OSError:
+			# same stage was saved by another run in the meantime
+			shutil.rmtree(tempDir)
+
+		return encodedResult
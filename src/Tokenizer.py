@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+import re, sys, csv, gzip, getopt
+from os.path import expanduser
+
+""" In-process Hungarian sentence and word tokenizer with compiled regular expressions.
+It follows those rules of huntoken 1.6 (hun_sentence, hun_abbrev and hun_token filters) which matter
+for the OpinHuBank corpus, and gives back the same tokens as Tokenize of NLPToolPool.py, without
+starting huntoken and parsing its XML output:
+- sentence boundary: '.', '?' or '!' (with closing quotes and brackets), if it is not followed by
+  a lowercase word, a comma, or a hyphenated suffix ("Ne már!"-ral), and it does not close an
+  abbreviation (dr.), a monogram (B. Jenő), a roman number (XIV. Lajos) or an ordinal number before
+  a date or a paragraph sign (25. §)
+- words: letters, numbers and hyphenated compounds (MSZP-s, 2009-ben, Zrt.-vel), dates (2013. 01. 06.),
+  numbers with thousands and quantity words (10 000, 300 ezer), percents (3,5%-a), internet
+  addresses, question particle '-e' (lesz -e) as a separate word
+- punctuation is dropped, as xmlparser.py drops <c> elements of huntoken
+- dot of a word is kept inside a sentence (Zrt. és), but not at the end of sentence, except abbreviations
+
+Tokens are latin2 encoded strings, same as huntoken's output. HTML entities are not decoded.
+Characters out of latin2 are replaced before tokenization (ToLatin2): typographic quotes, dashes and
+ellipsis by their ASCII forms (so they are dropped as punctuation), euro sign by 'EUR', others by a space.
+
+Conformance check with huntoken on the sentiment corpus, it prints differences and percent of identical documents:
+	python Tokenizer.py [-i <corpus csv>] [-n <documents>] [-j <corpus sentences joined into one document>] [-c <huntoken command>]
+Huntoken's output can be saved (-o) and compared later without huntoken (-g). The saved output of huntoken 1.6
+on the whole corpus is resources/HunToken/OpinHuBank_20130106_huntoken.txt.gz, test_Tokenizer.py compares with it:
+	python Tokenizer.py -g ../resources/HunToken/OpinHuBank_20130106_huntoken.txt.gz
+"""
+
+# Get home folder
+homeFolder = expanduser('~')
+
+corpusPath = homeFolder + '/SentimentAnalysisHUN-master/resources/SentimentCorpus/OpinHuBank_20130106.csv'
+
+# replacements of frequent characters which are missing from latin2, other ones are replaced by a space
+latin2Replacements = dict((ord(character), replacement) for (characters, replacement) in [
+	(u'„“”‟″«»', u'"'),
+	(u'‚‘’‛′‹›', u'\''),
+	(u'‐‑‒–—―−', u'-'),
+	(u'…', u'...'),
+	(u'€', u' EUR '),
+	(u'\u200b\u200c\u200d\u2060\ufeff', u''),
+] for character in characters)
+
+# character classes of huntoken (ISO-8859-2 letters)
+upperLetters = u'A-ZÁÉÍÓÖŐÚÜŰĄŁĽŚŠŞŤŹŽŻŔÂĂÄĹĆÇČĘËĚÎĎĐŃŇÔŘŮÝŢ'
+lowerLetters = u'a-záéíóöőúüűąłľśšşťźžżßŕâăäĺćçčęëěîďđńňôřůýţ'
+letters = upperLetters + lowerLetters
+# word characters without and with hyphen
+wordChars = letters + ur'0-9§\\/'
+compoundChars = wordChars + ur'\-'
+
+# one word abbreviations of huntoken (as compiled from its data/abbrevations.txt), their dot is kept
+abbreviations = set(u'''
+a A aug Aug bek Bek Bp br Br bt Bt Btk c C cca Cca Cs csüt Csüt Ctv dec Dec dk Dk dny Dny dr Dr du Du
+Dzs em Em ev Ev f F febr Febr felv Felv ford Ford fszla Fszla fszt Fszt gimn Gimn gr Gr Gy h H hg Hg
+hiv Hiv honv Honv hrsz Hrsz hsz Hsz htb Htb id Id ifj Ifj ig Ig igh Igh ill Ill ind Ind isk Isk izr Izr
+jan Jan jegyz Jegyz júl Júl jún Jún kb Kb ker Ker kft Kft kht Kht kk Kk kkt Kkt kp Kp Kr krt Krt köv
+Köv luth Luth m M mb Mb megh Megh Mr márc Márc NB nov Nov ny Ny nyug Nyug o O okl Okl okt Okt olv Olv
+ov Ov ovh Ovh p P pf Pf pl Pl Pp Ptk pu Pu ref Ref rkp Rkp rt Rt röv Röv sgt Sgt St sz Sz szept Szept
+szerk Szerk Szjt Szt t T tc Tc tkp Tkp törv Törv tvr Tvr Ty u U ua Ua ui Ui uo Uo v vö V Vö vsz Vsz Zs
+'''.split())
+
+romanMonth = ur'(?:[VX]?I{1,3}|I?[VX])'
+romanNumberPattern = re.compile(ur'^[IVXLCMD]+$')
+# monograms: capital letters, at sentence boundaries accented ones as well
+initialPattern = re.compile(ur'^[A-Z]$')
+accentedInitialPattern = re.compile(ur'^[' + upperLetters + ur'§]$', re.U)
+
+# candidate sentence boundary: closing punctuation with closing quotes and brackets
+boundaryPattern = re.compile(ur'[.?!]+(?:(?:\'\'|["\')\]])[.?!]*)*')
+# sentence goes on after boundary: lowercase word (maybe after dashes, brackets, quotes), comma or hyphenated suffix
+continuationPattern = re.compile(ur'(?:[()\-\[\],; "]*[' + lowerLetters + ur']|[,;:]|(?<=[\'")\]])-[' + compoundChars + ur'])', re.U)
+# word character right after a dot: www.akarmi.hu, 4.0
+dotContinuationPattern = re.compile(ur'[' + compoundChars + ur'%°]', re.U)
+# word before a dot boundary
+lastWordPattern = re.compile(ur'(?:^|[^' + compoundChars + ur'.%°])([' + compoundChars + ur']+)$', re.U)
+lastNumberPattern = re.compile(ur'(?:^|[^0-9])([0-9]+)$', re.U)
+# ordinal number before paragraph sign, number or month: 25. §, 2002. IV.
+ordinalContinuationPattern = re.compile(ur'[§0-9]|' + romanMonth + ur'\.', re.U)
+ordinalSentencePattern = re.compile(ur'[' + upperLetters + ur'§]', re.U)
+
+# numbers of huntoken, and their ranges: 10 000, 1.000,5, 3-4
+number = ur'[+-]?(?:[0-9]{1,3}(?: [0-9]{3})+(?:,[0-9]{1,3}(?: [0-9]{3})+)?|[0-9]{1,3}(?:\.[0-9]{3})+,[0-9]{1,3}(?:\.[0-9]{3})*|(?:[0-9]+,)?[0-9]+)'
+numberRange = number + ur'(?:--?' + number + ur')?'
+measure = ur'(?:(?:[pnmcdkMGT]?(?:m[23]?|[AbBNVWJgl]|Pa))|bar|min|°C|ha|[lth])'
+
+tokenPatterns = [
+	# internet addresses and e-mail addresses
+	ur'(?:[hH][tT][tT][pP][sS]?://|[wW]{3}\.)[^\s"<>=]*[^\s"<>=.,;:!?)]',
+	ur'(?:mailto:)?[' + letters + ur'0-9\-.]+@(?:[' + letters + ur'0-9\-_]+\.)+[' + letters + ur']+',
+	# dates: 2013. 01. 06., 2002. IV. 6., 2002. IV.
+	ur'(?:[12]?[0-9]{3}\. )?(?:[01]?[0-9]|' + romanMonth + ur')\. [0-3]?[0-9]\.(?=[\s.,;?!()\[\]{}:"\'\-&]|$)',
+	ur'[12]?[0-9]{3}\. ' + romanMonth + ur'\.',
+	# numbers with quantity words: 300 ezer, 1-1 milliót, but 3 milliós
+	numberRange + ur' (?!(?:milliós|milliárdos|billiós|trilliós)(?!z))(?:ezret|(?:ezer|millió|milliárd|billió|trillió)[' + compoundChars + ur']*)',
+	# measures: 5 km/h
+	ur'[0-9]+ ?' + measure + ur' ?/ ?[0-9]* ?' + measure + ur'(?![' + compoundChars + ur'])',
+	# numbers with thousands separated by space: 10 000
+	ur'[0-9]{1,3}(?: [0-9]{3})+(?:,[0-9]+)?(?![' + compoundChars + ur'])',
+	# percents, temperatures and formulas: 3,5%-a, 50%, °C, 1+1
+	ur'[+-]?(?:[0-9]+-)?[0-9]+(?:[.,][0-9]+)? ?%(?:-[' + letters + ur']+)?',
+	ur'°[CF]',
+	ur'[0-9]+%?(?:[+*=][0-9]+%?)+',
+	# enumerations and words with brackets: 2), (C), (ellen)forradalmár
+	ur'\((?:[0-9a-zA-Z]| [0-9a-zA-Z]+ ?| ?[0-9a-zA-Z]+ )\)',
+	ur'\(?[iIvVxX]+\)|[0-9a-zA-Z] ?\)',
+	ur'\([' + compoundChars + ur']+\)[' + compoundChars + ur']+|[' + compoundChars + ur']+\([' + compoundChars + ur']+\)[' + compoundChars + ur']*',
+	# monograms and other special words: K.K.TV, T&M, &Doom, O'Neill, "Ne már!"-ral
+	ur'(?:[A-Z]\.){2,}[' + compoundChars + ur']*',
+	ur'[A-Z]+&[A-Z]+|&[a-zA-Z]+;?',
+	ur'[' + wordChars + ur']+\'[' + wordChars + ur']+',
+	ur'"[^ "][^"]*"-[' + compoundChars + ur']+',
+	# words, numbers and hyphenated compounds: MSZP-s, 2009-ben, hvg.hu-nak, Zrt.-vel, 3,5, 13.00.
+	ur'[0-9]+(?:[.:\-][0-9]+)+\.(?![0-9]|\.\.)',
+	# dot after a word is kept, except after internet addresses (hvg.hu.) and before an ellipsis
+	ur'[' + wordChars + ur'][' + compoundChars + ur']*(?:(?:\.[' + compoundChars + ur']+)+|(?:(?<=[0-9])[,:][0-9][' + compoundChars + ur']*)*(?:\.(?!\.\.))?)',
+	ur'(?:\.[' + wordChars + ur'_]+)+',
+	ur'[+-][0-9]+(?:[.,][0-9]+)?',
+	ur'-[' + letters + ur']+',
+	# punctuation is dropped
+	ur'(?P<punctuation>\.\.\.|[.,;?!()\[\]{}:"\'\-])',
+	# any other character is a word: +, |, @
+	ur'\S',
+]
+tokenPattern = re.compile(u'|'.join(tokenPatterns), re.U)
+
+# question particle after a word: lesz-e
+particlePattern = re.compile(ur'^([' + letters + ur'][' + compoundChars + ur']*)(-e)$', re.U)
+# dot of last word belongs to the end of sentence if only closing quotes and brackets follow it
+sentenceEndPattern = re.compile(ur'^\.{0,2}(?:\'\'|["\')\]])?$', re.U)
+# except numbers with separators: 1-0., 13.00.
+numberDotPattern = re.compile(ur'^[0-9]+(?:[.,:\-][0-9]+)+\.$', re.U)
+
+paragraphPattern = re.compile(ur'\n[ \t\xa0\r]*\n\s*', re.U)
+spacePattern = re.compile(ur'\s+', re.U)
+
+
+def SplitSentences(paragraph):
+	# sentences of a paragraph as text
+	sentences = []
+	start = 0
+	for boundary in boundaryPattern.finditer(paragraph):
+		if not IsBoundary(paragraph, start, boundary):
+			continue
+		if paragraph[start:boundary.end()].strip() != u'':
+			sentences.append(paragraph[start:boundary.end()].strip())
+		start = boundary.end()
+
+	if paragraph[start:].strip() != u'':
+		sentences.append(paragraph[start:].strip())
+
+	return sentences
+
+
+def IsBoundary(paragraph, sentenceStart, boundary):
+	after = boundary.end()
+	if after == len(paragraph):
+		return True
+	# dot in a word, e.g. internet address
+	if paragraph[after - 1] == u'.' and dotContinuationPattern.match(paragraph, after):
+		return False
+	if continuationPattern.match(paragraph, after):
+		return False
+	if boundary.group(0) == u'.' and IsDotContinuation(paragraph, sentenceStart, boundary.start(), after):
+		return False
+	if InParentheses(paragraph, boundary.start(), after):
+		return False
+	return True
+
+
+def IsDotContinuation(paragraph, sentenceStart, dot, after):
+	# dot of an abbreviation, monogram, roman number or an ordinal number is not a sentence boundary
+	following = paragraph[after:].lstrip()
+
+	numberMatch = lastNumberPattern.search(paragraph, sentenceStart, dot)
+	if numberMatch is not None:
+		if ordinalContinuationPattern.match(following):
+			return True
+		# sentence is only an ordinal number: 25. Magyarország
+		if paragraph[sentenceStart:dot].strip() == numberMatch.group(1) and ordinalSentencePattern.match(following):
+			return True
+
+	wordMatch = lastWordPattern.search(paragraph, sentenceStart, dot)
+	if wordMatch is None:
+		return False
+	word = wordMatch.group(1)
+	return word in abbreviations or accentedInitialPattern.match(word) is not None or (romanNumberPattern.match(word) is not None and word != u'CD')
+
+
+def InParentheses(paragraph, boundary, after):
+	# boundary in parentheses: (családjában a 25.)
+	opening = paragraph.rfind(u'(', 0, boundary)
+	if opening < 0 or re.search(ur'[.?!)]', paragraph[opening:boundary]) is not None:
+		return False
+	closingParenthesis = paragraph.find(u')', boundary)
+	if closingParenthesis < 0:
+		return False
+	# sentence is closed after the parentheses: (... 16.).
+	if closingParenthesis < after:
+		return re.search(ur'[.?!]', paragraph[closingParenthesis:after]) is None
+	return re.search(ur'[.?!]', paragraph[after:closingParenthesis]) is None
+
+
+def TokenizeSentence(sentence):
+	tokens = []
+	lastEnd = 0
+	for match in tokenPattern.finditer(sentence):
+		if match.group('punctuation') is not None:
+			continue
+		token = match.group(0)
+		particle = particlePattern.match(token)
+		if particle is not None:
+			tokens.append(particle.group(1))
+			token = particle.group(2)
+		tokens.append(token)
+		lastEnd = match.end()
+
+	if len(tokens) == 0:
+		return tokens
+
+	# dot of last word belongs to the end of sentence, except abbreviations
+	word = tokens[-1][:-1]
+	if tokens[-1].endswith(u'.') and len(word) > 0 and not numberDotPattern.match(tokens[-1]) and sentenceEndPattern.match(sentence[lastEnd:]):
+		if not (word in abbreviations or word in (u'stb', u'Stb') or initialPattern.match(word) or (romanNumberPattern.match(word) and word != u'CD')):
+			tokens[-1] = word
+			particle = particlePattern.match(word)
+			if particle is not None:
+				tokens[-1:] = [particle.group(1), particle.group(2)]
+	# 'stb...' is 'stb.' and an ellipsis
+	if tokens[-1] in (u'stb', u'Stb') and sentence.startswith(u'...', lastEnd):
+		tokens[-1] += u'.'
+
+	return tokens
+
+
+def ToLatin2(inputString):
+	# text which can be encoded to latin2, characters out of latin2 are replaced
+	try:
+		inputString.encode('latin2')
+		return inputString
+	except UnicodeEncodeError:
+		pass
+
+	characters = []
+	for character in inputString.translate(latin2Replacements):
+		try:
+			character.encode('latin2')
+			characters.append(character)
+		except UnicodeEncodeError:
+			characters.append(u' ')
+	return u''.join(characters)
+
+
+def Tokenize(inputString):
+	# list of tokenized sentences, same as Tokenize of NLPToolPool.py gives back
+	sentences = []
+	for paragraph in paragraphPattern.split(ToLatin2(inputString).strip()):
+		for sentence in SplitSentences(spacePattern.sub(u' ', paragraph)):
+			tokens = TokenizeSentence(sentence)
+			if len(tokens) > 0:
+				sentences.append([token.encode('latin2') for token in tokens])
+	return sentences
+
+
+def TokenizeBatch(inputStrings):
+	# tokenized sentences by document, same as TokenizeBatch of NLPToolPool.py gives back
+	return [Tokenize(inputString) for inputString in inputStrings]
+
+
+def ReadDocuments(corpusFilePath, number, joined):
+	# sentences of original corpus, 'joined' consecutive sentences are one document
+	corpusfile = open(corpusFilePath, 'rb')
+	reader = csv.reader(corpusfile, delimiter=',')
+	# Skip header
+	next(reader, None)
+
+	sentences = [line[4].decode('latin2') for line in reader]
+	corpusfile.close()
+
+	documents = [u' '.join(sentences[i:i+joined]) for i in range(0, len(sentences), joined)]
+	return documents[:number] if number is not None else documents
+
+
+def ReadHuntokenOutput(filePath, number):
+	# saved huntoken output, a line for every document, sentences are separated by two tabs, tokens by one
+	outputfile = gzip.open(filePath, 'rb')
+	documents = []
+	for line in outputfile:
+		line = line.rstrip('\n')
+		documents.append([sentence.split('\t') for sentence in line.split('\t\t')] if line != '' else [])
+	outputfile.close()
+	return documents[:number] if number is not None else documents
+
+
+def WriteHuntokenOutput(filePath, documents):
+	outputfile = gzip.open(filePath, 'wb')
+	for sentences in documents:
+		outputfile.write('\t\t'.join('\t'.join(sentence) for sentence in sentences) + '\n')
+	outputfile.close()
+
+
+def ConformanceCheck(documents, expectedDocuments):
+	# documents which are tokenized differently by huntoken
+	if len(documents) != len(expectedDocuments):
+		raise ValueError('%d documents, but huntoken output has %d' % (len(documents), len(expectedDocuments)))
+
+	differences = []
+	for document, expectedSentences in zip(documents, expectedDocuments):
+		sentences = Tokenize(document)
+		if sentences != expectedSentences:
+			differences.append((document, expectedSentences, sentences))
+
+	return differences
+
+
+def main(argv):
+	inputfile = corpusPath
+	number = None
+	joined = 1
+	huntokenCommand = 'huntoken'
+	huntokenOutput = None
+	savedOutput = None
+	usage = 'Tokenizer.py -i <corpus csv> -n <documents> -j <corpus sentences joined into one document> -c <huntoken command> -o <save huntoken output> -g <saved huntoken output>'
+	try:
+		opts, args = getopt.getopt(argv, "hi:n:j:c:o:g:", ["input=", "number=", "joined=", "command=", "output=", "golden="])
+	except getopt.GetoptError:
+		print usage
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt == '-h':
+			print usage
+			sys.exit()
+		elif opt in ("-i", "--input"):
+			inputfile = arg
+		elif opt in ("-n", "--number"):
+			number = int(arg)
+		elif opt in ("-j", "--joined"):
+			joined = int(arg)
+		elif opt in ("-c", "--command"):
+			huntokenCommand = arg
+		elif opt in ("-o", "--output"):
+			huntokenOutput = arg
+		elif opt in ("-g", "--golden"):
+			savedOutput = arg
+
+	documents = ReadDocuments(inputfile, number, joined)
+	if savedOutput is not None:
+		expectedDocuments = ReadHuntokenOutput(savedOutput, number)
+	else:
+		from NLPToolPool import TokenizeBatch as HuntokenBatch
+		expectedDocuments = HuntokenBatch(documents, huntokenCommand)
+		if huntokenOutput is not None:
+			WriteHuntokenOutput(huntokenOutput, expectedDocuments)
+	differences = ConformanceCheck(documents, expectedDocuments)
+
+	for (document, expectedSentences, sentences) in differences:
+		print document.encode('utf-8')
+		# tokens are separated by '/', sentences by '//'
+		print '\thuntoken:\t' + ' // '.join(' / '.join(sentence) for sentence in expectedSentences).decode('latin2').encode('utf-8')
+		print '\tTokenizer:\t' + ' // '.join(' / '.join(sentence) for sentence in sentences).decode('latin2').encode('utf-8')
+
+	print 'Identical documents: %d of %d (%.2f%%)' % (len(documents) - len(differences), len(documents),
+		100.0 * (len(documents) - len(differences)) / max(len(documents), 1))
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+from array import array
+import numpy
+
+""" Shared vocabulary and compact token id representation of tokenized sentences.
+Instead of nested lists of strings, sentences are stored as one int32 array of token ids
+and an int64 array of sentence offsets: tokens of sentence i are ids[offsets[i]:offsets[i+1]].
+Ids are given by a Vocabulary, which interns every word once.
+
+Classes and functions:
+- Vocabulary: word <-> id mapping, a new word gets the next free id, ids never change.
+- EncodedSentences: token ids and offsets of a sentence list, indexable like a list (also by index arrays,
+  so train_test_split and GridSearchCV can split it), sentence i is a NumPy view of its ids.
+- Encoded: gives back EncodedSentences of an input, strings are split at whitespace.
+
+Usage example:
+	vocabulary = Vocabulary()
+	sentences = EncodedSentences.FromSentences([['ez', 'egy', 'alma'], ['alma']], vocabulary)
+	sentences[1]		# array([2], dtype=int32)
+	sentences.Decode()	# [['ez', 'egy', 'alma'], ['alma']]
+"""
+
+def BufferToNumpy(values, dtype):
+	# NumPy array over the memory of array.array without copy
+	if len(values) == 0:
+		return numpy.zeros(0, dtype=dtype)
+	return numpy.frombuffer(values, dtype=dtype)
+
+
+class Vocabulary(object):
+
+	def __init__(self, words=()):
+		self.words = []
+		self.ids = {}
+		for word in words:
+			self.Id(word)
+
+	def Id(self, word):
+		wordId = self.ids.get(word)
+		if wordId is None:
+			wordId = len(self.words)
+			self.ids[word] = wordId
+			self.words.append(word)
+		return wordId
+
+	def Lookup(self, word, default=-1):
+		return self.ids.get(word, default)
+
+	def Word(self, wordId):
+		return self.words[wordId]
+
+	def Encode(self, sentence):
+		return array('i', [self.Id(word) for word in sentence])
+
+	def IdMap(self, dictionary, default=-1):
+		# value of every id in an other word keyed dictionary, e.g. feature columns of a vectorizer
+		return numpy.array([dictionary.get(word, default) for word in self.words], dtype=numpy.int64)
+
+	def IdMask(self, words):
+		# True for ids of words in the given set
+		return numpy.array([word in words for word in self.words], dtype=bool)
+
+	def __len__(self):
+		return len(self.words)
+
+	def Save(self, filePath):
+		vocabularyfile = open(filePath, 'wb')
+		for word in self.words:
+			vocabularyfile.write(word + '\n')
+		vocabularyfile.close()
+
+	@staticmethod
+	def Load(filePath):
+		vocabularyfile = open(filePath, 'rb')
+		words = vocabularyfile.read().split('\n')[:-1]
+		vocabularyfile.close()
+		return Vocabulary(words)
+
+
+class EncodedSentences(object):
+
+	def __init__(self, ids, offsets, vocabulary):
+		self.ids = ids
+		self.offsets = offsets
+		self.vocabulary = vocabulary
+		# sklearn takes number of samples from shape and splits data by index arrays
+		self.shape = (len(offsets)-1,)
+
+	@classmethod
+	def FromSentences(cls, sentences, vocabulary=None):
+		# sentences can be a stream, only ids are kept in memory
+		if vocabulary is None:
+			vocabulary = Vocabulary()
+		ids = array('i')
+		offsets = array('l', [0])
+		for sentence in sentences:
+			ids.extend(vocabulary.Encode(sentence))
+			offsets.append(len(ids))
+		return cls(BufferToNumpy(ids, numpy.int32), BufferToNumpy(offsets, numpy.dtype('l')).astype(numpy.int64), vocabulary)
+
+	def __len__(self):
+		return self.shape[0]
+
+	def __getitem__(self, index):
+		if isinstance(index, (int, long, numpy.integer)):
+			if index < 0:
+				index += len(self)
+			return self.ids[self.offsets[index]:self.offsets[index+1]]
+		return self.Take(numpy.arange(len(self))[index])
+
+	def __iter__(self):
+		for i in range(0, len(self)):
+			yield self.ids[self.offsets[i]:self.offsets[i+1]]
+
+	def Lengths(self):
+		return numpy.diff(self.offsets)
+
+	def Take(self, indices):
+		# sentences at the given indexes, ids are gathered with one NumPy indexing
+		lengths = self.Lengths()[indices]
+		offsets = numpy.zeros(len(lengths)+1, dtype=numpy.int64)
+		numpy.cumsum(lengths, out=offsets[1:])
+		positions = numpy.repeat(self.offsets[indices] - offsets[:-1], lengths) + numpy.arange(offsets[-1])
+		return EncodedSentences(numpy.asarray(self.ids)[positions], offsets, self.vocabulary)
+
+	def RowIndices(self):
+		# sentence index of every token
+		return numpy.repeat(numpy.arange(len(self)), self.Lengths())
+
+	def Decode(self):
+		words = self.vocabulary.words
+		idList = self.ids.tolist()
+		offsetList = self.offsets.tolist()
+		return [[words[wordId] for wordId in idList[offsetList[i]:offsetList[i+1]]] for i in range(0, len(offsetList)-1)]
+
+
+def Encoded(documents):
+	if isinstance(documents, EncodedSentences):
+		return documents
+	return EncodedSentences.FromSentences(document.split() for document in documents)
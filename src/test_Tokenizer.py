@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import os, unittest
+
+import Tokenizer
+
+""" Tests of Tokenizer.py, run from the src folder:
+	python -m unittest test_Tokenizer
+The corpus is compared with the saved output of huntoken 1.6 (resources/HunToken/OpinHuBank_20130106_huntoken.txt.gz),
+it was written by 'python Tokenizer.py -c <huntoken 1.6 command> -o <file>'.
+"""
+
+resourcesFolder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'resources')
+corpusPath = os.path.join(resourcesFolder, 'SentimentCorpus', 'OpinHuBank_20130106.csv')
+huntokenOutputPath = os.path.join(resourcesFolder, 'HunToken', 'OpinHuBank_20130106_huntoken.txt.gz')
+
+
+def Tokens(sentences):
+	return [[token.decode('latin2') for token in sentence] for sentence in sentences]
+
+
+class TokenizerTest(unittest.TestCase):
+
+	def test_huntoken_conformance(self):
+		documents = Tokenizer.ReadDocuments(corpusPath, None, 1)
+		differences = Tokenizer.ConformanceCheck(documents, Tokenizer.ReadHuntokenOutput(huntokenOutputPath, None))
+		identical = len(documents) - len(differences)
+		self.assertGreaterEqual(100.0 * identical / len(documents), 99.9,
+			'identical documents: %d of %d' % (identical, len(documents)))
+
+	def test_typographic_punctuation(self):
+		# quotes, dashes and ellipsis out of latin2 are dropped as punctuation, euro sign is a word
+		sentences = Tokenizer.Tokenize(u'„Nagyon jó a kormány döntése” – mondta… Az ára 100 €, O’Neill szerint «drága». Szép nap volt!')
+		self.assertEqual(Tokens(sentences), [
+			[u'Nagyon', u'jó', u'a', u'kormány', u'döntése', u'mondta'],
+			[u'Az', u'ára', u'100', u'EUR', u"O'Neill", u'szerint', u'drága'],
+			[u'Szép', u'nap', u'volt'],
+		])
+
+	def test_other_characters(self):
+		# other characters out of latin2 separate words, zero width characters are removed
+		sentences = Tokenizer.Tokenize(u'Szép★nap vol\u200bt — ez az • igazság.')
+		self.assertEqual(Tokens(sentences), [[u'Szép', u'nap', u'volt', u'ez', u'az', u'igazság']])
+
+	def test_latin2_text_unchanged(self):
+		text = u'Árvíztűrő tükörfúrógép, 3,5%-a.'
+		self.assertIs(Tokenizer.ToLatin2(text), text)
+
+
+if __name__ == '__main__':
+	unittest.main()
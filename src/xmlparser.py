@@ -3,20 +3,26 @@
 
 import sys, os, fileinput
 
-""" A light xml parser application which is good for transforming HunToken's xml based output into plain lines, 
+""" A light xml parser application which is good for transforming HunToken's xml based output into plain lines,
 which is necesseraly for input data form of HunPoS (part-of-speech tagging) and HunMorph (morphological analysis).
-It is embedded in MorphologicalAnalysis.sh file's shell pipeline. """
+It is embedded in MorphologicalAnalysis.sh file's shell pipeline.
+ParseLines can be imported as well to do the same transformation in-process. """
+
+def ParseLines(lines):
+	# Yield one token per line and a 'thisistheending' line at every sentence closure
+	for line in lines:
+		if line.startswith("<w>"):
+			yield line.replace("<w>","").replace("</w>","").replace("\n","")
+		if line.startswith("</s>"):
+			yield "thisistheending"
 
 def main():
 	# Parse incoming XML file
-	try:	
-		for line in fileinput.input():
-			if line.startswith("<w>"):
-				print line.replace("<w>","").replace("</w>","").replace("\n","")
-			if line.startswith("</s>"):
-				print "thisistheending"
+	try:
+		for line in ParseLines(fileinput.input()):
+			print line
 	except:
-		print "ERROR at xmlparser.py file"			
-	
+		print "ERROR at xmlparser.py file"
+
 if __name__ == '__main__':
 	main()